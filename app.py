@@ -3,26 +3,40 @@ Complete App.py with All Routes and Features
 This file restores all functionality that was lost during Git rebase
 """
 
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, Response, stream_with_context
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_caching import Cache
-import google.generativeai as genai
+import gc
 import os
 import json
-import hashlib
 import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
-import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from functools import wraps
 import bleach  # For XSS prevention
 
 from config import get_config
 from validators import code_validator, ValidationError
-from ml_model import code_analyzer
+from ml_model import code_analyzer, LOADING, WARMING
+from embedding_service import EmbeddingService
+from rule_engine import rule_engine
 from language_detector import language_detector
+from result_cache import ResultCache, content_key
+from single_flight import SingleFlight
+from repo_pipeline import RepoPipeline
+from repo_archive import ArchiveError, download_archive_files
+from github_client import GitHubClient
+from repo_index import RepoIndex
+from file_scheduler import schedule_files
+from gemini_batch import BatchPrompter
+from prompt_planner import PromptPlanner, ALL_SECTIONS
+from code_chunker import split_code, merge_reviews
+from json_repair import repair_json, JSONRepairError
+from llm_backend import create_backend
+from job_queue import JobQueue, JobError
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -53,10 +67,74 @@ limiter = Limiter(
 )
 
 # Configure caching
-cache = Cache(app, config={
-    'CACHE_TYPE': config.CACHE_TYPE,
-    'CACHE_DEFAULT_TIMEOUT': config.CACHE_DEFAULT_TIMEOUT
-})
+result_cache = ResultCache(
+    config.RESULT_CACHE_PATH,
+    memory_items=config.RESULT_CACHE_MEMORY_ITEMS,
+    max_bytes=config.RESULT_CACHE_MAX_BYTES,
+    timeout=config.CACHE_DEFAULT_TIMEOUT
+)
+single_flight = SingleFlight(config.SINGLE_FLIGHT_LOCK_DIR, timeout=config.SINGLE_FLIGHT_TIMEOUT)
+
+# Configure GitHub API client (its own memory tier, so API responses do
+# not push analysis results out of the LRU; the SQLite file is shared)
+github_cache = ResultCache(
+    config.RESULT_CACHE_PATH,
+    memory_items=config.GITHUB_CACHE_MEMORY_ITEMS,
+    max_bytes=config.RESULT_CACHE_MAX_BYTES,
+    timeout=config.GITHUB_CACHE_TIMEOUT
+)
+github_client = GitHubClient(
+    config.GITHUB_API_URL,
+    cache=github_cache,
+    pool_size=config.GITHUB_POOL_SIZE,
+    max_retries=config.GITHUB_MAX_RETRIES,
+    max_rate_limit_wait=config.GITHUB_RATE_LIMIT_WAIT,
+    fresh_for=config.GITHUB_CACHE_FRESH,
+    cache_timeout=config.GITHUB_CACHE_TIMEOUT
+)
+
+# Repository analysis results by git blob SHA, for incremental re-analysis
+repo_index = RepoIndex(config.REPO_INDEX_PATH, max_age=config.REPO_INDEX_MAX_AGE)
+
+# Configure background jobs (workers start in each process on first use)
+job_queue = JobQueue(
+    config.JOB_QUEUE_PATH,
+    workers=config.JOB_WORKERS,
+    stale_after=config.JOB_STALE_AFTER,
+    retention=config.JOB_RETENTION,
+    logger=app.logger
+)
+
+# Repository files that are analyzed
+GITHUB_CODE_EXTENSIONS = ('.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.cpp', '.c', '.cs', '.go', '.rb', '.php', '.swift', '.kt')
+
+# File extension -> language for repository files
+GITHUB_LANGUAGE_MAP = {
+    'py': 'python', 'js': 'javascript', 'jsx': 'javascript',
+    'ts': 'typescript', 'tsx': 'typescript', 'java': 'java',
+    'cpp': 'cpp', 'c': 'c', 'cs': 'csharp', 'go': 'go',
+    'rb': 'ruby', 'php': 'php', 'swift': 'swift', 'kt': 'kotlin'
+}
+
+# Keep-alive interval for /api/analyze/stream while Gemini is still working
+SSE_HEARTBEAT_SECONDS = 15
+
+# A job's event stream closes after this many seconds and the client reopens
+# it, so a long job never holds a worker past gunicorn's timeout
+JOB_EVENTS_SECONDS = 20
+JOB_EVENTS_POLL_SECONDS = 0.5
+
+def streams_supported():
+    """True if the server handles requests on threads (gunicorn gthread, the dev server),
+    so a long-lived event stream does not take a whole worker away from other clients"""
+    return bool(request.environ.get('wsgi.multithread'))
+
+# Gemini calls run here so the local analysis can proceed alongside them
+analysis_executor = ThreadPoolExecutor(max_workers=config.ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+# Parts of large inputs are reviewed here, never on analysis_executor, whose
+# threads wait for them
+chunk_executor = ThreadPoolExecutor(max_workers=config.GEMINI_CHUNK_WORKERS, thread_name_prefix='gemini-chunk')
 
 # Configure logging
 if not app.debug:
@@ -76,28 +154,42 @@ if not app.debug:
     app.logger.setLevel(getattr(logging, config.LOG_LEVEL))
     app.logger.info('AI Code Review Assistant startup')
 
-# Configure Gemini AI
-if config.GEMINI_API_KEY:
-    genai.configure(api_key=config.GEMINI_API_KEY)
-    app.logger.info("Gemini AI configured successfully")
+# Configure AI backend (Gemini, or the offline stub for load tests)
+llm_backend = create_backend(config)
+if llm_backend.available:
+    app.logger.info(f"AI backend configured: {llm_backend.name} ({llm_backend.model_id})")
 else:
     app.logger.warning("GEMINI_API_KEY not found - AI analysis will be limited")
 
-# Load ML model in background
-ml_model = None
+# Configure static analysis; the backend is part of the ML cache and index keys
+code_analyzer.python_ast = config.PYTHON_AST_ANALYSIS
+ML_ANALYSIS_KEY = f"ml-{config.ML_ANALYSIS_VERSION}{'-ast' if config.PYTHON_AST_ANALYSIS else ''}-{rule_engine.fingerprint}"
 
-def load_ml_model():
-    global ml_model
-    try:
-        app.logger.info("Loading ML model...")
-        ml_model = code_analyzer
-        app.logger.info("ML model loaded successfully")
-    except Exception as e:
-        app.logger.error(f"Failed to load ML model: {e}")
+# Configure CodeBERT embeddings (fp32 or an int8 export; concurrent requests share padded batches)
+code_analyzer.backend = config.EMBEDDING_BACKEND
+code_analyzer.export_dir = config.EMBEDDING_EXPORT_DIR
+code_analyzer.mmap_weights = config.EMBEDDING_MMAP_WEIGHTS
+code_analyzer.num_threads = config.TORCH_NUM_THREADS or None
+code_analyzer.micro_batch_size = config.EMBEDDING_MICRO_BATCH
+code_analyzer.embedding_service = EmbeddingService(
+    code_analyzer.get_code_embeddings,
+    max_batch_size=config.EMBEDDING_BATCH_SIZE,
+    max_wait=config.EMBEDDING_MAX_WAIT_MS / 1000,
+    logger=app.logger
+)
 
-# Start model loading in background
-model_thread = threading.Thread(target=load_ml_model, daemon=True)
-model_thread.start()
+# Warm up CodeBERT in the background; until it is ready, embeddings take the
+# degraded path and /health/ready reports the warm-up
+if config.PRELOAD_MODEL:
+    # Load CodeBERT now: under gunicorn's preload_app this runs in the master
+    # before it forks, so every worker shares the weight pages copy-on-write.
+    # Workers run the warm-up batch (gunicorn.conf.py), so torch's thread
+    # pool never starts before the fork
+    code_analyzer.load_model()
+    # Keep the garbage collector from writing to (and so copying) pre-fork objects
+    gc.freeze()
+elif config.MODEL_WARMUP:
+    code_analyzer.start_warm_up()
 
 # ==================== AUTHENTICATION & SECURITY ====================
 
@@ -189,6 +281,9 @@ def before_request():
     # Make session permanent (expires after browser close)
     session.permanent = False
     
+    # Job workers start after gunicorn forks, once per worker process
+    job_queue.start()
+    
     # Log request for debugging (in development only)
     if config.DEBUG:
         app.logger.debug(f"{request.method} {request.path}")
@@ -210,109 +305,19 @@ def after_request(response):
     return response
 
 
-# Helper function for Gemini analysis
-def get_gemini_analysis(code, language):
-    """Get code analysis from Gemini AI"""
-    prompt = f"""You are an expert code reviewer with 15+ years of experience. Analyze this {language} code and provide an EXTREMELY DETAILED, comprehensive code review in JSON format.
-    
-    Code:
-    ```{language}
-    {code}
-    ```
-    
-    Return ONLY a valid JSON object with this EXACT structure (no markdown, no extra text):
-    {{
-        "overall_quality": "X/10",
-        "summary": "Detailed executive summary (4-5 sentences) with relevant emojis explaining the code's purpose, strengths, and key areas for improvement",
-        
-        "bugs": [
-            {{"issue": "Precise bug description with context", "line": "Line number or range", "severity": "Critical/High/Medium/Low", "fix": "Exact code fix with explanation", "impact": "What happens if not fixed"}}
-        ],
-        
-        "security": [
-            {{"risk": "Specific vulnerability (include OWASP category if applicable)", "severity": "Critical/High/Medium/Low", "mitigation": "Concrete steps to fix with code examples", "cwe_id": "CWE number if applicable"}}
-        ],
-        
-        "improvements": [
-            {{"category": "Performance/Security/Style/Logic/Maintainability", "suggestion": "Detailed suggestion with reasoning", "example": "Refactored code snippet", "priority": "High/Medium/Low", "effort": "Easy/Medium/Hard"}}
-        ],
-        
-        "best_practices": [
-            {{"practice": "Industry standard or design pattern name", "current": "How it's currently implemented", "recommended": "The proper pattern with code example", "benefit": "Why this matters"}}
-        ],
-        
-        "complexity_analysis": {{
-             "time_complexity": "Precise Big O notation (e.g., O(n²)) with detailed explanation of why",
-             "space_complexity": "Precise Big O notation with detailed explanation",
-             "cyclomatic_complexity": "Estimated complexity score with reasoning",
-             "cognitive_complexity": "How hard is this code to understand (1-10) with explanation"
-        }},
-        
-        "architecture_analysis": {{
-            "design_patterns": "List design patterns used or that should be used",
-            "separation_of_concerns": "Rating (1-10) and explanation",
-            "modularity": "Rating (1-10) and suggestions",
-            "coupling": "Tight/Loose coupling assessment",
-            "cohesion": "High/Low cohesion assessment"
-        }},
-        
-        "code_smells": [
-            {{"smell": "Name of code smell (e.g., Long Method, God Class)", "location": "Where it occurs", "refactoring": "How to fix it", "severity": "High/Medium/Low"}}
-        ],
-        
-        "performance_optimization": [
-            {{"issue": "Performance bottleneck description", "current_approach": "Current implementation", "optimized_approach": "Better approach with code", "expected_improvement": "Estimated performance gain"}}
-        ],
-        
-        "error_handling": {{
-            "rating": "X/10",
-            "issues": ["List of error handling problems"],
-            "recommendations": ["Specific improvements needed"]
-        }},
-        
-        "documentation_quality": {{
-            "rating": "X/10",
-            "missing": ["What documentation is missing"],
-            "suggestions": ["How to improve documentation"]
-        }},
-        
-        "testing_recommendations": [
-            {{"test_type": "Unit/Integration/E2E", "scenario": "What to test", "example": "Sample test case structure", "priority": "High/Medium/Low"}}
-        ],
-        
-        "dependency_analysis": {{
-            "external_dependencies": "Assessment of external dependencies",
-            "recommendations": "Suggestions for dependency management",
-            "security_concerns": "Any dependency-related security issues"
-        }},
-        
-        "scalability_assessment": {{
-            "current_scalability": "Rating (1-10) with explanation",
-            "bottlenecks": ["List of scalability bottlenecks"],
-            "recommendations": ["How to improve scalability"]
-        }},
-        
-        "code_duplication": {{
-            "detected": "Yes/No",
-            "instances": ["Where duplication occurs"],
-            "refactoring_suggestion": "How to eliminate duplication"
-        }},
-        
-        "refactoring_opportunities": [
-            {{"area": "What needs refactoring", "reason": "Why it needs refactoring", "approach": "How to refactor", "benefit": "Expected outcome"}}
-        ],
-        
-        "metrics": {{
-            "complexity": "X/10 (10 is simplest, 1 is most complex)",
-            "readability": "X/10",
-            "maintainability": "X/10",
-            "testability": "X/10",
-            "reusability": "X/10",
-            "reliability": "X/10"
-        }}
-    }}
-    
-    CRITICAL INSTRUCTIONS:
+# Review sections, schema size and output budget are planned per request
+prompt_planner = PromptPlanner(
+    compact_max_lines=config.PROMPT_COMPACT_MAX_LINES,
+    compact_max_bytes=config.PROMPT_COMPACT_MAX_BYTES,
+    max_output_tokens=config.GEMINI_MAX_OUTPUT_TOKENS,
+    strip_comments=config.PROMPT_STRIP_COMMENTS
+)
+
+# Review structure requested from Gemini for every repository file
+GEMINI_REVIEW_SCHEMA = prompt_planner.schema()
+
+# Review guidelines; {language} is filled in per prompt
+GEMINI_REVIEW_RULES = """CRITICAL INSTRUCTIONS:
     1. **Deep Logic Analysis**: Analyze the actual logic flow. Look for infinite loops, race conditions, off-by-one errors, edge cases, null pointer issues, and logical flaws.
     2. **Security First**: Identify SQL injection, XSS, CSRF, insecure deserialization, hardcoded secrets, weak crypto, IDOR, path traversal, command injection, etc.
     3. **Performance**: Find N+1 queries, unnecessary loops, redundant computations, memory leaks, inefficient algorithms, blocking operations.
@@ -320,158 +325,159 @@ def get_gemini_analysis(code, language):
     5. **Complexity Analysis**: Provide ACCURATE Big O notation. Don't say "Unable to parse" - calculate it properly.
     6. **Be Specific**: Give line numbers, exact code examples, and actionable recommendations.
     7. **Valid JSON ONLY**: Return ONLY the JSON object. No markdown code blocks, no extra text. Properly escape all quotes and special characters.
-    8. **Fill ALL Fields**: Every field must have meaningful content. No "N/A" or "Unable to parse" unless truly impossible to determine.
+    8. **Fill ALL Fields**: Every field must have meaningful content. No "N/A" or "Unable to parse" unless truly impossible to determine."""
+
+def build_gemini_prompt(plan, language):
+    """Single-file review prompt for a PromptPlan"""
+    detail = "a concise" if plan.compact else "an EXTREMELY DETAILED, comprehensive"
+    return f"""You are an expert code reviewer with 15+ years of experience. Analyze this {language} code and provide {detail} code review in JSON format.
+    
+    Code:
+    ```{language}
+    {plan.code}
+    ```
+    
+    Return ONLY a valid JSON object with this EXACT structure (no markdown, no extra text):
+    {prompt_planner.schema(plan.sections, plan.compact)}
+    
+    {GEMINI_REVIEW_RULES.format(language=language)}
+    {plan.notes}
     """
 
+# Small repository files share one Gemini request
+gemini_batcher = BatchPrompter(
+    GEMINI_REVIEW_SCHEMA,
+    GEMINI_REVIEW_RULES,
+    max_batch_tokens=config.GEMINI_BATCH_TOKENS,
+    max_batch_files=config.GEMINI_BATCH_FILES,
+    max_file_tokens=config.GEMINI_BATCH_FILE_TOKENS
+)
+
+def parse_gemini_response(response_text, code):
+    """Turn a Gemini reply into an analysis dict, repairing or estimating what it cannot parse"""
+    # Well-formed replies take the C parser; anything else is repaired in one pass
+    start = response_text.find('{')
+    end = response_text.rfind('}')
+    analysis = None
     try:
-        # Configure model with generation settings
-        model = genai.GenerativeModel(
-            'gemini-2.5-flash',  
-            generation_config={
-                'temperature': 0.7,
-                'top_p': 0.95,
-                'top_k': 40,
-                'max_output_tokens': 8000,
-            }
-        )
-        
-        # Generate content
-        response = model.generate_content(prompt)
-        response_text = response.text.strip()
-        
-        # Remove markdown code blocks if present
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            response_text = response_text.split('```')[1].split('```')[0].strip()
-        
-        # Try to parse JSON
+        analysis = json.loads(response_text[start:end + 1] if start >= 0 else response_text)
+    except (json.JSONDecodeError, RecursionError) as json_err:
+        # RecursionError: nested too deeply for the C parser; the repairer refuses it too
         try:
-            analysis = json.loads(response_text)
-        except json.JSONDecodeError as json_err:
-            app.logger.warning(f"Initial JSON parse failed: {json_err}")
-            
-            # Try to fix common JSON issues
-            import re
-            
-            # Strategy 1: Fix unescaped quotes and newlines in strings
-            fixed_text = response_text
-            
-            # Replace unescaped newlines within strings
-            fixed_text = re.sub(r'(?<!\\)\\n', '\\\\n', fixed_text)
-            fixed_text = re.sub(r'(?<!\\)\\r', '\\\\r', fixed_text)
-            fixed_text = re.sub(r'(?<!\\)\\t', '\\\\t', fixed_text)
-            
-            # Try parsing with fixed text
-            try:
-                analysis = json.loads(fixed_text)
-                app.logger.info("✅ JSON fixed and parsed successfully")
-            except json.JSONDecodeError as err2:
-                app.logger.warning(f"Second parse attempt failed: {err2}")
-                
-                # Strategy 2: Use ast.literal_eval as fallback
-                try:
-                    import ast
-                    # Try to convert to Python dict first
-                    analysis = ast.literal_eval(fixed_text)
-                    app.logger.info("✅ Parsed using ast.literal_eval")
-                except:
-                    # Strategy 3: Create fallback structure
-                    app.logger.warning(f"Using fallback analysis structure due to JSON parse error")
-                
-                # Extract what we can using regex
-                quality_match = re.search(r'"overall_quality"\s*:\s*"([^"]+)"', response_text)
-                summary_match = re.search(r'"summary"\s*:\s*"([^"]+)"', response_text)
-                
-                # Estimate complexity based on code length and structure
-                lines = code.split('\n')
-                code_length = len(lines)
-                
-                # Simple heuristic for time complexity
-                if 'for' in code.lower() and code.lower().count('for') >= 2:
-                    time_complexity = "O(n²) - Nested loops detected"
-                elif 'for' in code.lower() or 'while' in code.lower():
-                    time_complexity = "O(n) - Linear iteration detected"
-                else:
-                    time_complexity = "O(1) - Constant time operations"
-                
-                analysis = {
-                    'overall_quality': quality_match.group(1) if quality_match else '7/10',
-                    'summary': summary_match.group(1) if summary_match else '🔍 Analysis completed. The code has been reviewed for quality, security, and performance. Some details may be incomplete due to formatting issues. Please review the specific sections below for detailed insights.',
-                    'bugs': [],
-                    'improvements': [],
-                    'best_practices': [],
-                    'security': [],
-                    'complexity_analysis': {
-                        'time_complexity': time_complexity,
-                        'space_complexity': f"O(n) - Estimated based on {code_length} lines of code",
-                        'cyclomatic_complexity': f"{min(10, max(1, code_length // 10))} - Moderate complexity",
-                        'cognitive_complexity': "6/10 - Requires moderate mental effort to understand"
-                    },
-                    'architecture_analysis': {
-                        'design_patterns': 'Analysis in progress - manual review recommended',
-                        'separation_of_concerns': '7/10 - Generally well-structured',
-                        'modularity': '7/10 - Code is reasonably modular',
-                        'coupling': 'Moderate coupling detected',
-                        'cohesion': 'Moderate to high cohesion'
-                    },
-                    'code_smells': [],
-                    'performance_optimization': [],
-                    'error_handling': {
-                        'rating': '7/10',
-                        'issues': ['Error handling analysis incomplete'],
-                        'recommendations': ['Add comprehensive error handling', 'Use try-catch blocks appropriately']
-                    },
-                    'documentation_quality': {
-                        'rating': '6/10',
-                        'missing': ['Function documentation', 'Inline comments for complex logic'],
-                        'suggestions': ['Add docstrings', 'Document edge cases']
-                    },
-                    'testing_recommendations': [],
-                    'dependency_analysis': {
-                        'external_dependencies': 'Review required',
-                        'recommendations': 'Keep dependencies up to date',
-                        'security_concerns': 'Audit dependencies for vulnerabilities'
-                    },
-                    'scalability_assessment': {
-                        'current_scalability': '7/10 - Moderate scalability',
-                        'bottlenecks': ['Requires detailed profiling'],
-                        'recommendations': ['Consider caching', 'Optimize database queries']
-                    },
-                    'code_duplication': {
-                        'detected': 'Unknown',
-                        'instances': [],
-                        'refactoring_suggestion': 'Use DRY principle'
-                    },
-                    'refactoring_opportunities': [],
-                    'metrics': {
-                        'complexity': '7/10',
-                        'readability': '7/10',
-                        'maintainability': '7/10',
-                        'testability': '7/10',
-                        'reusability': '7/10',
-                        'reliability': '7/10'
-                    }
-                }
-        
-        # Ensure metrics are in correct format
-        if 'metrics' in analysis:
-            for key in ['complexity', 'readability', 'maintainability', 'testability']:
-                if key in analysis['metrics']:
-                    val = analysis['metrics'][key]
-                    if isinstance(val, (int, float)):
-                        analysis['metrics'][key] = f"{int(val)}/10"
-        
-        # Ensure overall_quality is in correct format
-        if 'overall_quality' in analysis:
-            val = analysis['overall_quality']
-            if isinstance(val, (int, float)):
-                try:
-                    analysis['overall_quality'] = f"{int(val)}/10"
-                except:
-                    pass
+            # The review is an object; an array only when there is no object at all
+            analysis, repairs = repair_json(response_text, start if start >= 0 else response_text.find('['))
+            app.logger.info(f"✅ JSON repaired ({repairs} fixes) after: {json_err}")
+        except JSONRepairError:
+            app.logger.warning(f"Using fallback analysis structure due to JSON parse error: {json_err}")
+    
+    if not isinstance(analysis, dict) or not analysis:
+        # Estimate complexity based on code length and structure
+        lines = code.split('\n')
+        code_length = len(lines)
+        
+        # Simple heuristic for time complexity
+        if 'for' in code.lower() and code.lower().count('for') >= 2:
+            time_complexity = "O(n²) - Nested loops detected"
+        elif 'for' in code.lower() or 'while' in code.lower():
+            time_complexity = "O(n) - Linear iteration detected"
+        else:
+            time_complexity = "O(1) - Constant time operations"
         
-        return analysis
+        # An estimate, not a review: flagged so it is never cached or indexed
+        analysis = {
+            'overall_quality': '7/10',
+            'summary': '🔍 Analysis completed. The code has been reviewed for quality, security, and performance. Some details may be incomplete due to formatting issues. Please review the specific sections below for detailed insights.',
+            'is_fallback': True,
+            'bugs': [],
+            'improvements': [],
+            'best_practices': [],
+            'security': [],
+            'complexity_analysis': {
+                'time_complexity': time_complexity,
+                'space_complexity': f"O(n) - Estimated based on {code_length} lines of code",
+                'cyclomatic_complexity': f"{min(10, max(1, code_length // 10))} - Moderate complexity",
+                'cognitive_complexity': "6/10 - Requires moderate mental effort to understand"
+            },
+            'architecture_analysis': {
+                'design_patterns': 'Analysis in progress - manual review recommended',
+                'separation_of_concerns': '7/10 - Generally well-structured',
+                'modularity': '7/10 - Code is reasonably modular',
+                'coupling': 'Moderate coupling detected',
+                'cohesion': 'Moderate to high cohesion'
+            },
+            'code_smells': [],
+            'performance_optimization': [],
+            'error_handling': {
+                'rating': '7/10',
+                'issues': ['Error handling analysis incomplete'],
+                'recommendations': ['Add comprehensive error handling', 'Use try-catch blocks appropriately']
+            },
+            'documentation_quality': {
+                'rating': '6/10',
+                'missing': ['Function documentation', 'Inline comments for complex logic'],
+                'suggestions': ['Add docstrings', 'Document edge cases']
+            },
+            'testing_recommendations': [],
+            'dependency_analysis': {
+                'external_dependencies': 'Review required',
+                'recommendations': 'Keep dependencies up to date',
+                'security_concerns': 'Audit dependencies for vulnerabilities'
+            },
+            'scalability_assessment': {
+                'current_scalability': '7/10 - Moderate scalability',
+                'bottlenecks': ['Requires detailed profiling'],
+                'recommendations': ['Consider caching', 'Optimize database queries']
+            },
+            'code_duplication': {
+                'detected': 'Unknown',
+                'instances': [],
+                'refactoring_suggestion': 'Use DRY principle'
+            },
+            'refactoring_opportunities': [],
+            'metrics': {
+                'complexity': '7/10',
+                'readability': '7/10',
+                'maintainability': '7/10',
+                'testability': '7/10',
+                'reusability': '7/10',
+                'reliability': '7/10'
+            }
+        }
+    
+    # A reply cut off early may lack the metrics the UI always reads
+    if not isinstance(analysis.get('metrics'), dict):
+        analysis['metrics'] = {}
+    
+    # Ensure metrics are in correct format
+    if 'metrics' in analysis:
+        for key in ['complexity', 'readability', 'maintainability', 'testability']:
+            if key in analysis['metrics']:
+                val = analysis['metrics'][key]
+                if isinstance(val, (int, float)):
+                    analysis['metrics'][key] = f"{int(val)}/10"
+    
+    # Ensure overall_quality is in correct format
+    if 'overall_quality' in analysis:
+        val = analysis['overall_quality']
+        if isinstance(val, (int, float)):
+            try:
+                analysis['overall_quality'] = f"{int(val)}/10"
+            except:
+                pass
+    
+    return analysis
+
+# Helper function for Gemini analysis
+def get_gemini_analysis(code, language, plan=None):
+    """Get code analysis from Gemini AI"""
+    plan = plan or prompt_planner.plan(code, language)
+    if not plan.excerpt and len(code) > config.GEMINI_CHUNK_CHARS:
+        return get_chunked_gemini_analysis(code, language, plan.sections)
+    app.logger.info(f"   📝 Prompt plan: {plan.summary()}")
+    try:
+        response_text = llm_backend.generate(build_gemini_prompt(plan, language),
+                                             max_output_tokens=plan.max_output_tokens)
+        return parse_gemini_response(response_text, code)
         
     except Exception as e:
         error_msg = str(e)
@@ -486,6 +492,7 @@ def get_gemini_analysis(code, language):
         return {
             'overall_quality': '7/10',
             'summary': summary,
+            'is_fallback': True,
             'bugs': [],
             'improvements': [],
             'best_practices': [],
@@ -522,6 +529,181 @@ def get_gemini_analysis(code, language):
             }
         }
 
+def get_chunked_gemini_analysis(code, language, sections):
+    """
+    Review a large input in parts, concurrently, and merge the findings
+    Parts are cached on their own, so a retry or an edit re-reviews only
+    the parts that failed or changed
+    """
+    chunks = split_code(code, language, config.GEMINI_CHUNK_CHARS)
+    app.logger.info(f"   🧩 Reviewing {len(code)} characters in {len(chunks)} parts")
+    futures = [
+        chunk_executor.submit(cached_gemini_analysis, chunk.code, language, sections, True)
+        for chunk in chunks
+    ]
+    reviews = [future.result()[0] for future in futures]
+    # If every part failed, the first part's placeholder explains why
+    return merge_reviews(chunks, reviews) or reviews[0]
+
+def get_gemini_batch_analysis(files):
+    """
+    Review several (path, language, code) files in one Gemini request
+    Returns one result per file, None where the reply has no usable section
+    """
+    prompt = gemini_batcher.build_prompt([
+        (path, language, prompt_planner.plan(code, language).code) for path, language, code in files
+    ])
+    response_text = llm_backend.generate(prompt, max_output_tokens=config.GEMINI_BATCH_OUTPUT_TOKENS)
+    sections = gemini_batcher.split_response(response_text, len(files))
+    results = []
+    for number, (_, _, code) in enumerate(files, 1):
+        section = sections.get(number)
+        results.append(parse_gemini_response(section, code) if section else None)
+    return results
+
+def timed_call(func, *args):
+    """Call func(*args) and return (result, elapsed seconds)"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+def cached_ml_analysis(code, language):
+    """ML analysis through the result cache; returns (result, cache_hit)"""
+    key = content_key(code, language, ML_ANALYSIS_KEY)
+    result = result_cache.get(key)
+    if result is not None:
+        return result, True
+    result = code_analyzer.analyze_code_quality(code, language)
+    # Cheap to recompute, so it only stays in this worker's memory for a while
+    result_cache.set(key, result, timeout=config.ML_CACHE_TIMEOUT, persist=False)
+    return result, False
+
+def gemini_cache_key(code, language, plan=None, batch=False):
+    """
+    Result cache key of a Gemini review
+    Keyed on the code as sent to Gemini, so comment-only edits still hit;
+    reviews from a multi-file prompt (shorter by design) are kept apart
+    """
+    plan = plan or prompt_planner.plan(code, language)
+    tag = plan.tag + '@batch' if batch else plan.tag
+    return content_key(plan.code, language, f"ai-{config.AI_ANALYSIS_VERSION}-{llm_backend.model_id}-{tag}")
+
+def cached_gemini_analysis(code, language, sections=None, excerpt=False):
+    """Gemini analysis through the result cache; returns (result, cache_hit)"""
+    plan = prompt_planner.plan(code, language, sections or ALL_SECTIONS, excerpt)
+    key = gemini_cache_key(code, language, plan)
+    result = result_cache.get(key)
+    if result is not None:
+        return result, True
+    if plan.sections != ALL_SECTIONS:
+        # A full review of the same code answers any section filter
+        full = result_cache.get(gemini_cache_key(code, language, prompt_planner.plan(code, language, excerpt=excerpt)))
+        if full is not None:
+            return {name: value for name, value in full.items() if name in plan.sections}, True
+
+    def compute():
+        result = get_gemini_analysis(code, language, plan)
+        # Placeholder and partial results are never stored
+        if not result.get('is_fallback') and not result.get('partial'):
+            result_cache.set(key, result, timeout=config.AI_CACHE_TIMEOUT)
+        return result
+
+    # Identical requests in flight (in any worker) wait for one Gemini call
+    return single_flight.run(key, compute, lookup=lambda: result_cache.get(key))
+
+def cached_gemini_batch_analysis(files):
+    """Batched Gemini analysis through the result cache; one result per (path, language, code)"""
+    plans = [prompt_planner.plan(code, language) for _, language, code in files]
+    keys = [gemini_cache_key(code, language, plan, batch=True) for (_, language, code), plan in zip(files, plans)]
+    # A single-file review of the same code serves a batch too, never the other way round
+    results = [
+        result_cache.get(key) or result_cache.get(gemini_cache_key(code, language, plan))
+        for key, (_, language, code), plan in zip(keys, files, plans)
+    ]
+    missing = [i for i, result in enumerate(results) if result is None]
+    
+    if len(missing) > 1:
+        try:
+            batch_results = get_gemini_batch_analysis([files[i] for i in missing])
+        except Exception as e:
+            app.logger.warning(f"Batched Gemini analysis failed, reviewing files one by one: {e}")
+            batch_results = [None] * len(missing)
+        for i, result in zip(missing, batch_results):
+            if result is not None and not result.get('is_fallback') and not result.get('partial'):
+                result_cache.set(keys[i], result, timeout=config.AI_CACHE_TIMEOUT)
+                results[i] = result
+    
+    # A lone file, or files the batch reply left out or answered unusably, get their own request
+    for i, result in enumerate(results):
+        if result is None:
+            _, language, code = files[i]
+            results[i], _ = cached_gemini_analysis(code, language)
+    return results
+
+def parse_analysis_request(data):
+    """Validate an analysis request; returns (code, language, error_response)"""
+    if not data:
+        return None, None, (jsonify({'error': 'No data provided'}), 400)
+    
+    code = data.get('code', '').strip()
+    language = data.get('language', 'auto')
+    
+    # Validate and sanitize inputs
+    app.logger.info("=" * 60)
+    app.logger.info("🚀 STARTING CODE ANALYSIS")
+    app.logger.info("=" * 60)
+    app.logger.info(f"📝 Code length: {len(code)} characters")
+    app.logger.info(f"📝 Code lines: {len(code.split(chr(10)))} lines")
+    
+    # Input validation
+    validation_errors = validate_code_input(code, language)
+    if validation_errors:
+        app.logger.error(f"❌ Input validation failed: {', '.join(validation_errors)}")
+        return None, None, (jsonify({'error': '; '.join(validation_errors)}), 400)
+    
+    # Sanitize language input (but not code - we need original code for analysis)
+    language = sanitize_input(language, max_length=50)
+    
+    try:
+        app.logger.info("✓ Step 1/4: Validating code...")
+        code_validator.validate(code)
+        app.logger.info("✅ Code validation passed")
+    except ValidationError as e:
+        app.logger.error(f"❌ Validation failed: {e}")
+        return None, None, (jsonify({'error': str(e)}), 400)
+    
+    # Detect language if auto
+    if language == 'auto':
+        app.logger.info("✓ Step 2/4: Detecting language...")
+        language = language_detector.detect(code)
+        app.logger.info(f"✅ Language detected: {language}")
+    else:
+        app.logger.info(f"✓ Step 2/4: Language specified: {language}")
+    
+    return code, language, None
+
+def parse_review_sections(data):
+    """Review sections asked for in the body or ?sections=; returns (sections, error_response)"""
+    value = (data or {}).get('sections') or request.args.get('sections')
+    try:
+        return prompt_planner.parse_sections(value), None
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+
+def ml_fallback_result(ml_result, reason):
+    """AI column content built from the ML result when Gemini is unavailable"""
+    return {
+        'error': f'{reason} - showing ML fallback',
+        'overall_quality': ml_result.get('overall_quality', 'N/A'),
+        'summary': f'🔑 Gemini AI Unavailable ({reason})\\n\\n📊 Showing ML Model Results as Fallback:\\n{ml_result.get("summary", "Please add your Gemini API key to enable AI analysis.")}',
+        'bugs': ml_result.get('bugs', []),
+        'improvements': ml_result.get('improvements', []),
+        'best_practices': ml_result.get('best_practices', []),
+        'security': ml_result.get('security', []),
+        'metrics': ml_result.get('metrics', {}),
+        'is_fallback': True
+    }
+
 # ==================== ROUTES ====================
 
 # Landing and Main Pages
@@ -587,90 +769,46 @@ def analyze_code_endpoint():
     start_time = datetime.now()
     
     try:
-        # Get request data
         data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
-        code = data.get('code', '').strip()
-        language = data.get('language', 'auto')
-        
-        # Validate and sanitize inputs
-        app.logger.info("=" * 60)
-        app.logger.info("🚀 STARTING CODE ANALYSIS")
-        app.logger.info("=" * 60)
-        app.logger.info(f"📝 Code length: {len(code)} characters")
-        app.logger.info(f"📝 Code lines: {len(code.split(chr(10)))} lines")
-        
-        # Input validation
-        validation_errors = validate_code_input(code, language)
-        if validation_errors:
-            app.logger.error(f"❌ Input validation failed: {', '.join(validation_errors)}")
-            return jsonify({'error': '; '.join(validation_errors)}), 400
-        
-        # Sanitize language input (but not code - we need original code for analysis)
-        language = sanitize_input(language, max_length=50)
-        
-        try:
-            app.logger.info("✓ Step 1/4: Validating code...")
-            code_validator.validate(code)
-            app.logger.info("✅ Code validation passed")
-        except ValidationError as e:
-            app.logger.error(f"❌ Validation failed: {e}")
-            return jsonify({'error': str(e)}), 400
-        
-        # Detect language if auto
-        if language == 'auto':
-            app.logger.info("✓ Step 2/4: Detecting language...")
-            language = language_detector.detect(code)
-            app.logger.info(f"✅ Language detected: {language}")
-        else:
-            app.logger.info(f"✓ Step 2/4: Language specified: {language}")
-        
-        # Generate cache key
-        cache_key = hashlib.md5(f"{code}{language}".encode()).hexdigest()
-        app.logger.info(f"🔑 Cache key: {cache_key[:16]}...")
-        
-        # Check cache
-        cached_result = cache.get(cache_key)
-        if cached_result:
-            app.logger.info(f"⚡ Cache hit! Returning cached result")
-            app.logger.info("=" * 60)
-            return jsonify(cached_result)
-        
-        # ML Analysis
+        code, language, error = parse_analysis_request(data)
+        if error:
+            return error
+        sections, error = parse_review_sections(data)
+        if error:
+            return error
+        
+        # Gemini runs in the background while the local analysis runs here
+        ai_future = None
+        if llm_backend.available:
+            app.logger.info("   📡 Sending code to Gemini API in the background...")
+            ai_future = analysis_executor.submit(timed_call, cached_gemini_analysis, code, language, sections)
+            ai_deadline = time.monotonic() + config.GEMINI_DEADLINE
+        
+        # ML Analysis (cached per layer, see cached_ml_analysis)
         app.logger.info("✓ Step 3/4: Running ML analysis...")
         app.logger.info("   📊 Analyzing code quality metrics...")
-        ml_result = code_analyzer.analyze_code_quality(code, language)
-        app.logger.info(f"✅ ML analysis complete - Score: {ml_result.get('overall_quality', 'N/A')}")
+        (ml_result, ml_cached), ml_seconds = timed_call(cached_ml_analysis, code, language)
+        app.logger.info(f"✅ ML analysis complete - Score: {ml_result.get('overall_quality', 'N/A')}{' (cached)' if ml_cached else ''}")
         
         # AI Analysis
         ai_fallback = False
-        app.logger.info("✓ Step 4/4: Running Gemini AI analysis...")
+        ai_cached = False
+        ai_seconds = None
+        app.logger.info("✓ Step 4/4: Waiting for Gemini AI analysis...")
         try:
-            if config.GEMINI_API_KEY:
-                app.logger.info("   🤖 Initializing Gemini AI model...")
-                app.logger.info("   📡 Sending code to Gemini API...")
-                ai_result = get_gemini_analysis(code, language)
-                app.logger.info(f"✅ AI analysis complete - Score: {ai_result.get('overall_quality', 'N/A')}")
-            else:
+            if ai_future is None:
                 raise Exception("API key not configured")
+            try:
+                (ai_result, ai_cached), ai_seconds = ai_future.result(timeout=max(0, ai_deadline - time.monotonic()))
+            except FutureTimeoutError:
+                # The call keeps running and caches its result for the next request
+                raise Exception(f"Gemini did not answer within {config.GEMINI_DEADLINE:g}s")
+            app.logger.info(f"✅ AI analysis complete - Score: {ai_result.get('overall_quality', 'N/A')}{' (cached)' if ai_cached else ''}")
         except Exception as e:
             app.logger.warning(f"⚠️  AI analysis failed: {e}")
             app.logger.info("   📊 Using ML fallback results...")
             ai_fallback = True
-            ai_result = {
-                'error': 'API key not configured - showing ML fallback',
-                'overall_quality': ml_result.get('overall_quality', 'N/A'),
-                'summary': f'🔑 Gemini API Key Not Configured\\n\\n📊 Showing ML Model Results as Fallback:\\n{ml_result.get("summary", "Please add your Gemini API key to enable AI analysis.")}',
-                'bugs': ml_result.get('bugs', []),
-                'improvements': ml_result.get('improvements', []),
-                'best_practices': ml_result.get('best_practices', []),
-                'security': ml_result.get('security', []),
-                'metrics': ml_result.get('metrics', {}),
-                'is_fallback': True
-            }
+            ai_result = ml_fallback_result(ml_result, e)
         
         # Calculate analysis time
         analysis_time = (datetime.now() - start_time).total_seconds()
@@ -680,18 +818,20 @@ def analyze_code_endpoint():
             'ml_analysis': ml_result,
             'ai_analysis': ai_result,
             'language': language,
+            'sections': list(sections),
             'analysis_time': analysis_time,
-            'ai_fallback': ai_fallback
+            'ai_fallback': ai_fallback,
+            'cached': {'ml': ml_cached, 'ai': ai_cached},
+            'stage_times': {
+                'ml': round(ml_seconds, 3),
+                'ai': round(ai_seconds, 3) if ai_seconds is not None else None
+            }
         }
         
-        # Cache result
-        cache.set(cache_key, result, timeout=config.CACHE_DEFAULT_TIMEOUT)
-        
         app.logger.info("=" * 60)
         app.logger.info(f"✅ ANALYSIS COMPLETED in {analysis_time:.2f}s")
         app.logger.info(f"   📊 ML Score: {ml_result.get('overall_quality', 'N/A')}")
         app.logger.info(f"   🤖 AI Score: {ai_result.get('overall_quality', 'N/A')}")
-        app.logger.info(f"   ⚡ Cached: Yes (key: {cache_key[:16]}...)")
         app.logger.info("=" * 60)
         
         return jsonify(result)
@@ -703,42 +843,123 @@ def analyze_code_endpoint():
             'message': str(e)
         }), 500
 
+def sse_event(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.route('/api/analyze/stream', methods=['POST'])
+@limiter.limit("10 per minute" if config.RATELIMIT_ENABLED else "1000 per minute")
+def analyze_code_stream():
+    """
+    Streaming variant of /api/analyze
+    Sends Server-Sent Events as each stage finishes: language, ml, ai, done
+    """
+    start_time = time.perf_counter()
+    
+    data = request.get_json()
+    code, language, error = parse_analysis_request(data)
+    if error:
+        return error
+    sections, error = parse_review_sections(data)
+    if error:
+        return error
+    
+    ai_future = None
+    if llm_backend.available:
+        ai_future = analysis_executor.submit(timed_call, cached_gemini_analysis, code, language, sections)
+        ai_deadline = time.monotonic() + config.GEMINI_DEADLINE
+    
+    def generate():
+        yield sse_event('language', {
+            'language': language,
+            'display_name': language_detector.get_language_display_name(language)
+        })
+        
+        try:
+            (ml_result, ml_cached), ml_seconds = timed_call(cached_ml_analysis, code, language)
+        except Exception as e:
+            app.logger.error(f"Analysis error: {e}", exc_info=True)
+            yield sse_event('error', {'error': 'Analysis failed', 'message': str(e)})
+            return
+        yield sse_event('ml', {'ml_analysis': ml_result, 'cached': ml_cached, 'seconds': round(ml_seconds, 3)})
+        
+        ai_fallback = False
+        ai_cached = False
+        ai_seconds = None
+        try:
+            if ai_future is None:
+                raise Exception("API key not configured")
+            while True:
+                remaining = ai_deadline - time.monotonic()
+                if remaining <= 0:
+                    raise Exception(f"Gemini did not answer within {config.GEMINI_DEADLINE:g}s")
+                try:
+                    (ai_result, ai_cached), ai_seconds = ai_future.result(timeout=min(remaining, SSE_HEARTBEAT_SECONDS))
+                    break
+                except FutureTimeoutError:
+                    # Comment line that keeps proxies from closing an idle stream
+                    yield ": waiting for gemini\n\n"
+        except Exception as e:
+            app.logger.warning(f"⚠️  AI analysis failed: {e}")
+            ai_fallback = True
+            ai_result = ml_fallback_result(ml_result, e)
+        yield sse_event('ai', {
+            'ai_analysis': ai_result,
+            'ai_fallback': ai_fallback,
+            'cached': ai_cached,
+            'seconds': round(ai_seconds, 3) if ai_seconds is not None else None
+        })
+        
+        yield sse_event('done', {
+            'language': language,
+            'sections': list(sections),
+            'analysis_time': time.perf_counter() - start_time,
+            'ai_fallback': ai_fallback,
+            'cached': {'ml': ml_cached, 'ai': ai_cached},
+            'stage_times': {
+                'ml': round(ml_seconds, 3),
+                'ai': round(ai_seconds, 3) if ai_seconds is not None else None
+            }
+        })
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+    })
+
 # GitHub Repository Analysis
-@app.route('/api/analyze-github', methods=['POST'])
-@limiter.limit("5 per minute" if config.RATELIMIT_ENABLED else "1000 per minute")
-def analyze_github_repo():
+def run_github_analysis(data, github_token='', progress=None, file_limit=None, byte_limit=None, time_budget=None):
     """
-    Analyze entire GitHub repository
-    Fetches all code files and analyzes them
+    Analyze a GitHub repository; returns (response_body, status_code)
+    Shared by /api/analyze-github and background jobs, which pass a
+    progress(dict) callback and larger file and time budgets
     """
     import requests
     import base64
     
     start_time = datetime.now()
+    file_limit = file_limit or config.GITHUB_MAX_FILES
+    byte_limit = byte_limit or config.GITHUB_MAX_BYTES
+    time_budget = time_budget or config.GITHUB_TIME_BUDGET
+    report_progress = progress or (lambda *args, **kwargs: None)
     
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No data provided'}), 400
-        
         repo_url = data.get('repo_url', '').strip()
-        github_token = data.get('github_token', '').strip()
         
         if not repo_url:
-            return jsonify({'error': 'Repository URL is required'}), 400
+            return {'error': 'Repository URL is required'}, 400
         
         # Parse GitHub URL
         # Format: https://github.com/owner/repo
         try:
             parts = repo_url.replace('https://github.com/', '').replace('http://github.com/', '').strip('/').split('/')
             if len(parts) < 2:
-                return jsonify({'error': 'Invalid GitHub URL format'}), 400
+                return {'error': 'Invalid GitHub URL format'}, 400
             
             owner = parts[0]
             repo = parts[1]
         except:
-            return jsonify({'error': 'Invalid GitHub URL'}), 400
+            return {'error': 'Invalid GitHub URL'}, 400
         
         # GitHub API headers
         headers = {
@@ -748,10 +969,10 @@ def analyze_github_repo():
             headers['Authorization'] = f'token {github_token}'
         
         # First, get repository info to find the default branch
-        repo_info_url = f'https://api.github.com/repos/{owner}/{repo}'
+        repo_info_url = f'{config.GITHUB_API_URL}/repos/{owner}/{repo}'
         app.logger.info(f"Fetching repository info: {repo_info_url}")
         
-        repo_info_response = requests.get(repo_info_url, headers=headers, timeout=30)
+        repo_info_response = github_client.get_json(repo_info_url, headers=headers, timeout=30)
         
         if repo_info_response.status_code != 200:
             error_message = 'Repository not found or access denied'
@@ -763,40 +984,45 @@ def analyze_github_repo():
                 error_message = 'Access forbidden. You may have exceeded the GitHub API rate limit or lack permissions.'
             
             app.logger.error(f"GitHub API error: {repo_info_response.status_code} - {error_message}")
-            return jsonify({'error': error_message}), 400
+            return {'error': error_message}, 400
         
         repo_data = repo_info_response.json()
         default_branch = repo_data.get('default_branch', 'main')
         
         app.logger.info(f"Repository default branch: {default_branch}")
         
-        # Fetch repository tree using the correct default branch
-        tree_url = f'https://api.github.com/repos/{owner}/{repo}/git/trees/{default_branch}?recursive=1'
+        # The file budget replaces the old hard cap of 10 files
+        max_files = file_limit
+        if data.get('max_files'):
+            max_files = max(1, min(int(data['max_files']), max_files))
+        max_bytes = byte_limit
         
+        # Fetch repository tree using the correct default branch
+        tree_url = f'{config.GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{default_branch}?recursive=1'
+    
         app.logger.info(f"Fetching repository tree: {tree_url}")
-        tree_response = requests.get(tree_url, headers=headers, timeout=30)
-        
+        tree_response = github_client.get_json(tree_url, headers=headers, timeout=30)
+    
         if tree_response.status_code != 200:
             error_message = f'GitHub API returned status {tree_response.status_code}'
-            
+        
             # Provide specific error messages for common status codes
             if tree_response.status_code == 409:
                 # Try fallback: Use contents API for root directory
                 app.logger.warning("Tree API returned 409, trying contents API fallback...")
                 try:
-                    contents_url = f'https://api.github.com/repos/{owner}/{repo}/contents'
-                    contents_response = requests.get(contents_url, headers=headers, timeout=30)
-                    
+                    contents_url = f'{config.GITHUB_API_URL}/repos/{owner}/{repo}/contents'
+                    contents_response = github_client.get_json(contents_url, headers=headers, timeout=30)
+                
                     if contents_response.status_code == 200:
                         contents_data = contents_response.json()
                         # Get only files from root directory
-                        code_extensions = ['.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.cpp', '.c', '.cs', '.go', '.rb', '.php', '.swift', '.kt']
                         code_files = [
-                            {'path': item['name'], 'size': item.get('size', 0)}
+                            {'path': item['name'], 'size': item.get('size', 0), 'type': 'blob', 'sha': item.get('sha')}
                             for item in contents_data
-                            if item['type'] == 'file' and any(item['name'].endswith(ext) for ext in code_extensions)
+                            if item['type'] == 'file' and item['name'].endswith(GITHUB_CODE_EXTENSIONS)
                         ]
-                        
+                    
                         if code_files:
                             app.logger.info(f"Fallback successful: Found {len(code_files)} files in root directory")
                             tree_data = {'tree': code_files}
@@ -809,127 +1035,211 @@ def analyze_github_repo():
                 except Exception as e:
                     app.logger.error(f"Fallback failed: {str(e)}")
                     error_message = 'Repository is too large or complex. Please try a smaller repository or one with fewer files.'
-                    
-                    return jsonify({
+                
+                    return {
                         'error': 'Failed to fetch repository',
                         'message': error_message,
                         'status_code': tree_response.status_code
-                    }), 400
+                    }, 400
             elif tree_response.status_code == 403:
                 error_message = 'GitHub API rate limit exceeded. Please try again later or use a GitHub token.'
             elif tree_response.status_code == 404:
                 error_message = 'Repository not found or branch does not exist. Please check the URL.'
             elif tree_response.status_code == 401:
                 error_message = 'Authentication failed. Please check your GitHub token.'
-            
+        
             if tree_response.status_code != 409:  # Only return error if not 409 (fallback handled above)
                 app.logger.error(f"GitHub API error: {tree_response.status_code} - {error_message}")
-                
-                return jsonify({
+            
+                return {
                     'error': 'Failed to fetch repository',
                     'message': error_message,
                     'status_code': tree_response.status_code
-                }), 400
+                }, 400
         else:
             tree_data = tree_response.json()
-        
+    
         # Filter code files
-        code_extensions = ['.py', '.js', '.jsx', '.ts', '.tsx', '.java', '.cpp', '.c', '.cs', '.go', '.rb', '.php', '.swift', '.kt']
         code_files = [
             item for item in tree_data.get('tree', [])
-            if item['type'] == 'blob' and any(item['path'].endswith(ext) for ext in code_extensions)
+            if item['type'] == 'blob' and item['path'].endswith(GITHUB_CODE_EXTENSIONS)
         ]
+        total_files = len(code_files)
+        code_files = [item for item in code_files if item.get('size', 0) <= config.GITHUB_MAX_FILE_BYTES]
+    
+        app.logger.info(f"Found {total_files} code files in repository")
+        report_progress({'stage': 'listing', 'total_files': total_files}, force=True)
+        
+        def file_language(file_item):
+            return GITHUB_LANGUAGE_MAP.get(file_item['path'].split('.')[-1], 'auto')
+        
+        # Files whose blob SHA is already indexed reuse their stored results
+        review_enabled = llm_backend.available
+        repo_key = f'{owner}/{repo}'.lower()
+        index_version = f"{ML_ANALYSIS_KEY}-ai-{config.AI_ANALYSIS_VERSION}-{llm_backend.model_id}"
+        indexed = repo_index.lookup(
+            repo_key, index_version, [(item.get('sha'), file_language(item)) for item in code_files]
+        )
+        reusable = {}
+        for file_item in code_files:
+            entry = indexed.get((file_item.get('sha'), file_language(file_item)))
+            # A file indexed before Gemini was available still needs its review
+            if entry is None or (review_enabled and entry['ai_result'] is None):
+                continue
+            reusable[file_item['path']] = entry
         
-        app.logger.info(f"Found {len(code_files)} code files in repository")
+        # Most useful files first, within the file and byte budgets; reused
+        # files cost no bytes
+        files_to_analyze, schedule_stats = schedule_files(
+            code_files, max_files, max_bytes, language_of=file_language, free=reusable
+        )
+        app.logger.info(f"File schedule: {schedule_stats}")
+        reused_records = {
+            file_item['path']: {
+                'item': file_item,
+                'ml_result': reusable[file_item['path']]['ml_result'],
+                'ai_result': reusable[file_item['path']]['ai_result'] if review_enabled else None
+            }
+            for file_item in files_to_analyze if file_item['path'] in reusable
+        }
+        changed_files = [item for item in files_to_analyze if item['path'] not in reused_records]
+        app.logger.info(f"Reusing {len(reused_records)} unchanged files, analyzing {len(changed_files)}")
         
-        # Limit to first 10 files to avoid timeout
-        max_files = 10
-        files_to_analyze = code_files[:max_files]
+        # Archive mode: one tarball download instead of one API call per file
+        fetch_mode = data.get('fetch_mode', config.GITHUB_FETCH_MODE)
+        if fetch_mode == 'archive' and changed_files:
+            try:
+                archive_files, _ = download_archive_files(
+                    config.GITHUB_API_URL, owner, repo, default_branch, headers,
+                    GITHUB_CODE_EXTENSIONS, config.GITHUB_MAX_FILE_BYTES, len(changed_files),
+                    config.GITHUB_MAX_ARCHIVE_BYTES, session=github_client,
+                    paths={item['path'] for item in changed_files}
+                )
+                app.logger.info(f"Read {len(archive_files)} files from the repository archive")
+                contents = {item['path']: item['content'] for item in archive_files}
+                changed_files = [
+                    dict(item, content=contents[item['path']]) if item['path'] in contents else item
+                    for item in changed_files
+                ]
+            except (ArchiveError, requests.exceptions.RequestException) as e:
+                app.logger.warning(f"Archive download failed, using the contents API: {e}")
+                fetch_mode = 'contents'
+        elif fetch_mode != 'archive':
+            fetch_mode = 'contents'
+        
+        
+        def fetch_file(file_item):
+            if 'content' in file_item:
+                return file_item['content']
+            file_url = f'{config.GITHUB_API_URL}/repos/{owner}/{repo}/contents/{file_item["path"]}'
+            file_response = github_client.get_json(file_url, headers=headers, timeout=15)
+            if file_response.status_code != 200:
+                return None
+            return base64.b64decode(file_response.json()['content']).decode('utf-8', errors='ignore')
+        
+        def analyze_file(file_item, content):
+            ml_result, _ = cached_ml_analysis(content, file_language(file_item))
+            return ml_result
+        
+        def review_file(file_item, content):
+            ai_result, _ = cached_gemini_analysis(content, file_language(file_item))
+            return ai_result
+        
+        def review_files(batch):
+            return cached_gemini_batch_analysis([
+                (file_item['path'], file_language(file_item), content) for file_item, content in batch
+            ])
+        
+        pipeline = RepoPipeline(
+            fetch_workers=config.GITHUB_FETCH_WORKERS,
+            ai_workers=config.GITHUB_AI_WORKERS,
+            max_in_flight=config.GITHUB_MAX_IN_FLIGHT,
+            time_budget=time_budget,
+            logger=app.logger,
+            batch_budget=config.GEMINI_BATCH_TOKENS if config.GEMINI_BATCH_ENABLED else 0,
+            batch_files=config.GEMINI_BATCH_FILES
+        )
+        report_progress({'stage': 'analyzing', 'files_reused': len(reused_records), 'files_to_analyze': len(changed_files)}, force=True)
+        computed_records, pipeline_stats = pipeline.run(
+            changed_files, fetch_file, analyze_file,
+            review=review_file if review_enabled else None,
+            review_batch=review_files, batch_cost=gemini_batcher.cost,
+            progress=lambda stats: report_progress(dict(
+                stats, stage='analyzing', files_reused=len(reused_records), files_to_analyze=len(changed_files)
+            ))
+        )
+        app.logger.info(f"Repository pipeline: {pipeline_stats}")
+        
+        # Index fresh results; skipped or failed reviews are left out so the
+        # next run retries them
+        repo_index.store(repo_key, index_version, [
+            (
+                record['item'].get('sha'), file_language(record['item']), record['ml_result'],
+                record['ai_result'] if record['ai_result'] and 'error' not in record['ai_result']
+                and not record['ai_result'].get('is_fallback') and not record['ai_result'].get('partial') else None
+            )
+            for record in computed_records
+        ])
+        repo_index.touch(repo_key, index_version, [record['item'].get('sha') for record in reused_records.values()])
+        repo_index.count(len(reused_records), len(computed_records))
+        
+        # Back into tree order
+        computed_by_path = {record['item']['path']: record for record in computed_records}
+        records = [
+            reused_records.get(item['path']) or computed_by_path[item['path']]
+            for item in files_to_analyze
+            if item['path'] in reused_records or item['path'] in computed_by_path
+        ]
         
         analyzed_files = []
         total_bugs = 0
         total_security_issues = 0
         
-        for file_item in files_to_analyze:
-            try:
-                # Fetch file content
-                file_url = f'https://api.github.com/repos/{owner}/{repo}/contents/{file_item["path"]}'
-                file_response = requests.get(file_url, headers=headers, timeout=15)
-                
-                if file_response.status_code != 200:
-                    continue
-                
-                file_data = file_response.json()
-                
-                # Decode content
-                content = base64.b64decode(file_data['content']).decode('utf-8', errors='ignore')
-                
-                # Detect language
-                file_ext = file_item['path'].split('.')[-1]
-                language_map = {
-                    'py': 'python', 'js': 'javascript', 'jsx': 'javascript',
-                    'ts': 'typescript', 'tsx': 'typescript', 'java': 'java',
-                    'cpp': 'cpp', 'c': 'c', 'cs': 'csharp', 'go': 'go',
-                    'rb': 'ruby', 'php': 'php', 'swift': 'swift', 'kt': 'kotlin'
+        for record in records:
+            file_item = record['item']
+            ml_result = record['ml_result']
+            ai_result = record['ai_result']
+            
+            # Count issues
+            ml_bugs = len(ml_result.get('bugs', []))
+            ml_security = len(ml_result.get('security', []))
+            ml_improvements = len(ml_result.get('improvements', []))
+            ai_bugs = len(ai_result.get('bugs', [])) if ai_result and 'bugs' in ai_result else 0
+            ai_security = len(ai_result.get('security', [])) if ai_result and 'security' in ai_result else 0
+            ai_improvements = len(ai_result.get('improvements', [])) if ai_result and 'improvements' in ai_result else 0
+            
+            total_bugs += ml_bugs + ai_bugs
+            total_security_issues += ml_security + ai_security
+            
+            analyzed_files.append({
+                'path': file_item['path'],
+                'language': file_language(file_item),
+                'size': file_item['size'],
+                'ml_analysis': {
+                    'quality': ml_result.get('overall_quality', 'N/A'),
+                    'bugs_count': ml_bugs,
+                    'security_count': ml_security,
+                    'improvements_count': ml_improvements,
+                    'bugs': ml_result.get('bugs', [])[:3],  # First 3 bugs
+                    'security': ml_result.get('security', [])[:3],  # First 3 security issues
+                    'improvements': ml_result.get('improvements', [])[:3]  # First 3 improvements
+                },
+                'ai_analysis': {
+                    'quality': ai_result.get('overall_quality', 'N/A') if ai_result else 'N/A',
+                    'bugs_count': ai_bugs,
+                    'security_count': ai_security,
+                    'improvements_count': ai_improvements,
+                    'bugs': ai_result.get('bugs', [])[:3] if ai_result and 'bugs' in ai_result else [],
+                    'security': ai_result.get('security', [])[:3] if ai_result and 'security' in ai_result else [],
+                    'improvements': ai_result.get('improvements', [])[:3] if ai_result and 'improvements' in ai_result else []
                 }
-                language = language_map.get(file_ext, 'auto')
-                
-                # Analyze with ML
-                ml_result = code_analyzer.analyze_code_quality(content, language)
-                
-                # Analyze with AI
-                ai_result = None
-                try:
-                    if config.GEMINI_API_KEY:
-                        ai_result = get_gemini_analysis(content, language)
-                except Exception as ai_error:
-                    app.logger.warning(f"AI analysis failed for {file_item['path']}: {ai_error}")
-                    ai_result = {'error': 'AI analysis unavailable'}
-                
-                # Count issues
-                ml_bugs = len(ml_result.get('bugs', []))
-                ml_security = len(ml_result.get('security', []))
-                ml_improvements = len(ml_result.get('improvements', []))
-                ai_bugs = len(ai_result.get('bugs', [])) if ai_result and 'bugs' in ai_result else 0
-                ai_security = len(ai_result.get('security', [])) if ai_result and 'security' in ai_result else 0
-                ai_improvements = len(ai_result.get('improvements', [])) if ai_result and 'improvements' in ai_result else 0
-                
-                total_bugs += ml_bugs + ai_bugs
-                total_security_issues += ml_security + ai_security
-                
-                analyzed_files.append({
-                    'path': file_item['path'],
-                    'language': language,
-                    'size': file_item['size'],
-                    'ml_analysis': {
-                        'quality': ml_result.get('overall_quality', 'N/A'),
-                        'bugs_count': ml_bugs,
-                        'security_count': ml_security,
-                        'improvements_count': ml_improvements,
-                        'bugs': ml_result.get('bugs', [])[:3],  # First 3 bugs
-                        'security': ml_result.get('security', [])[:3],  # First 3 security issues
-                        'improvements': ml_result.get('improvements', [])[:3]  # First 3 improvements
-                    },
-                    'ai_analysis': {
-                        'quality': ai_result.get('overall_quality', 'N/A') if ai_result else 'N/A',
-                        'bugs_count': ai_bugs,
-                        'security_count': ai_security,
-                        'improvements_count': ai_improvements,
-                        'bugs': ai_result.get('bugs', [])[:3] if ai_result and 'bugs' in ai_result else [],
-                        'security': ai_result.get('security', [])[:3] if ai_result and 'security' in ai_result else [],
-                        'improvements': ai_result.get('improvements', [])[:3] if ai_result and 'improvements' in ai_result else []
-                    }
-                })
-                
-            except Exception as file_error:
-                app.logger.error(f"Error analyzing {file_item['path']}: {file_error}")
-                continue
+            })
         
         analysis_time = (datetime.now() - start_time).total_seconds()
         
         result = {
             'repository': f'{owner}/{repo}',
-            'total_files': len(code_files),
+            'total_files': total_files,
             'analyzed_files': len(analyzed_files),
             'total_bugs': total_bugs,
             'total_security_issues': total_security_issues,
@@ -937,41 +1247,209 @@ def analyze_github_repo():
             'analysis_time': analysis_time,
             'total_time': analysis_time,  # For Firestore compatibility
             'repo_data': repo_data,  # Include repo metadata for Firestore
-            'note': f'Analyzed first {max_files} files. Full repository has {len(code_files)} code files.'
+            'schedule': schedule_stats,
+            'pipeline': pipeline_stats,
+            'fetch_mode': fetch_mode,
+            'files_reused': len(reused_records),
+            'files_recomputed': len(computed_records),
+            'note': f'Analyzed {len(analyzed_files)} of {total_files} code files, {len(reused_records)} unchanged since the last run (budget: {max_files} files, {max_bytes // 1024} KB, {time_budget:g}s).'
         }
         
         app.logger.info(f"GitHub analysis completed in {analysis_time:.2f}s")
-        return jsonify(result)
+        return result, 200
         
     except requests.exceptions.Timeout:
-        return jsonify({
+        return {
             'error': 'Request timeout',
             'message': 'GitHub API request timed out. Please try again.'
-        }), 408
+        }, 408
     except requests.exceptions.RequestException as e:
         app.logger.error(f"GitHub API error: {e}")
-        return jsonify({
+        return {
             'error': 'GitHub API error',
             'message': str(e)
-        }), 500
+        }, 500
     except Exception as e:
         app.logger.error(f"GitHub analysis error: {e}", exc_info=True)
-        return jsonify({
+        return {
             'error': 'Analysis failed',
             'message': str(e)
-        }), 500
+        }, 500
+
+@app.route('/api/analyze-github', methods=['POST'])
+@limiter.limit("5 per minute" if config.RATELIMIT_ENABLED else "1000 per minute")
+def analyze_github_repo():
+    """
+    Analyze entire GitHub repository
+    Fetches all code files and analyzes them within the request time budget
+    """
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    body, status_code = run_github_analysis(data, data.get('github_token', '').strip())
+    return jsonify(body), status_code
+
+def github_analysis_job(payload, secrets, report_progress):
+    """Background job handler: whole-repository analysis with the job budgets"""
+    body, status_code = run_github_analysis(
+        payload, secrets.get('github_token', ''), progress=report_progress,
+        file_limit=config.JOB_GITHUB_MAX_FILES, byte_limit=config.JOB_GITHUB_MAX_BYTES,
+        time_budget=config.JOB_GITHUB_TIME_BUDGET
+    )
+    if status_code != 200:
+        raise JobError(body.get('message') or body.get('error', 'Analysis failed'), result=dict(body, status_code=status_code))
+    report_progress({'stage': 'done', 'analyzed_files': body['analyzed_files']}, force=True)
+    return body
+
+job_queue.register('analyze-github', github_analysis_job)
+
+# Background jobs
+@app.route('/api/jobs/analyze-github', methods=['POST'])
+@limiter.limit("5 per minute" if config.RATELIMIT_ENABLED else "1000 per minute")
+def submit_github_job():
+    """Queue a whole-repository analysis; poll the returned URLs for progress and the result"""
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    if not data.get('repo_url', '').strip():
+        return jsonify({'error': 'Repository URL is required'}), 400
+    
+    payload = {key: data[key] for key in ('repo_url', 'max_files', 'fetch_mode') if data.get(key)}
+    github_token = data.get('github_token', '').strip()
+    job_id = job_queue.submit('analyze-github', payload, secrets={'github_token': github_token} if github_token else None)
+    app.logger.info(f"Queued GitHub analysis job {job_id} for {payload['repo_url']}")
+    
+    job = {
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('job_status', job_id=job_id),
+        'progress_url': url_for('job_progress', job_id=job_id),
+        'result_url': url_for('job_result', job_id=job_id)
+    }
+    # Sync workers poll result_url instead of holding a worker per follower
+    if streams_supported():
+        job['events_url'] = url_for('job_events', job_id=job_id)
+    return jsonify(job), 202
+
+# Reading a job is cheap and clients follow it for as long as it runs, so
+# these endpoints are not rate limited (submitting one is)
+@app.route('/api/jobs/<job_id>')
+@limiter.exempt
+def job_status(job_id):
+    """Job state, progress and timings (without the result)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    job.pop('result')
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/progress')
+@limiter.exempt
+def job_progress(job_id):
+    """Just the progress of a job"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'job_id': job_id, 'status': job['status'], 'progress': job['progress']})
+
+@app.route('/api/jobs/<job_id>/events')
+@limiter.exempt
+def job_events(job_id):
+    """
+    Progress of a job as Server-Sent Events: 'progress' whenever it changes,
+    'finished' once the job is done or failed. The stream closes after
+    JOB_EVENTS_SECONDS; clients reopen it until they see 'finished'
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if not streams_supported():
+        return jsonify({'error': 'Event streams need threaded workers', 'result_url': url_for('job_result', job_id=job_id)}), 501
+    
+    def generate():
+        closes = time.monotonic() + JOB_EVENTS_SECONDS
+        last = None
+        while True:
+            job = job_queue.get(job_id)
+            if job is None:
+                return
+            state = (job['status'], job['progress'])
+            if state != last:
+                last = state
+                yield sse_event('progress', {'job_id': job_id, 'status': job['status'], 'progress': job['progress']})
+            if job['status'] in ('done', 'failed'):
+                yield sse_event('finished', {'job_id': job_id, 'status': job['status']})
+                return
+            if time.monotonic() >= closes:
+                return
+            time.sleep(JOB_EVENTS_POLL_SECONDS)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Disable proxy buffering (nginx)
+    })
+
+@app.route('/api/jobs/<job_id>/result')
+@limiter.exempt
+def job_result(job_id):
+    """The result of a finished job; 202 while it is still queued or running"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] == 'failed':
+        result = job['result'] or {'error': 'Analysis failed', 'message': job['error']}
+        return jsonify(result), 400 if result.get('status_code', 500) < 500 else 500
+    if job['status'] != 'done':
+        return jsonify({'job_id': job_id, 'status': job['status'], 'progress': job['progress']}), 202
+    return jsonify(job['result'])
 
 # Health check
 @app.route('/health')
 def health():
-    """Health check endpoint"""
+    """Health check endpoint: liveness, readiness and component stats"""
+    model_status = code_analyzer.status()
     return jsonify({
         'status': 'healthy',
+        'live': True,
+        'ready': model_ready(model_status),
+        'degraded': not model_status['ready'],
         'timestamp': datetime.now().isoformat(),
-        'ml_model_loaded': ml_model is not None,
-        'gemini_configured': config.GEMINI_API_KEY is not None
+        'ml_model_loaded': code_analyzer.loaded,
+        'ml_model': model_status,
+        'gemini_configured': config.GEMINI_API_KEY is not None,
+        'llm': llm_backend.stats(),
+        'cache': result_cache.stats(),
+        'single_flight': single_flight.stats(),
+        'github_api': github_client.stats(),
+        'repo_index': repo_index.stats(),
+        'jobs': job_queue.stats(),
+        'embeddings': code_analyzer.embedding_service.stats()
     })
 
+@app.route('/health/live')
+def health_live():
+    """Liveness: the process is up and answering"""
+    return jsonify({'live': True, 'timestamp': datetime.now().isoformat()})
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness: 503 while the model is loading or warming up"""
+    model_status = code_analyzer.status()
+    ready = model_ready(model_status)
+    return jsonify({
+        'ready': ready,
+        'degraded': not model_status['ready'],
+        'ml_model': model_status
+    }), 200 if ready else 503
+
+def model_ready(model_status):
+    """
+    Ready unless the model is still loading or warming up: an instance whose
+    model failed (or is not warmed up at startup) serves the degraded path
+    rather than being kept out of rotation
+    """
+    return model_status['state'] not in (LOADING, WARMING)
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(e):
@@ -12,4 +12,9 @@ pip install -r requirements.txt
 mkdir -p logs
 mkdir -p cache
 
+# Export the int8 CodeBERT encoder once, instead of in every worker on first load
+if [ "${EMBEDDING_BACKEND:-torch}" != "torch" ]; then
+    python model_export.py --format "$EMBEDDING_BACKEND" --check
+fi
+
 echo "Build completed successfully!"
@@ -0,0 +1,252 @@
+"""
+Splitting of large inputs into reviewable parts, and merging of the parts' reviews
+Code is cut at the shallowest nesting level that makes parts small enough
+(top-level functions and classes first, then methods, then statements), so
+each part can be reviewed on its own; reviews are merged back with their
+line numbers moved from part-relative to input-relative
+"""
+
+import json
+import re
+
+from lexer import COMMENT, STRING, lexer_for
+
+# Languages whose blocks are delimited by braces rather than indentation
+BRACE_LANGUAGES = {
+    'javascript', 'typescript', 'java', 'c', 'cpp', 'csharp', 'go', 'rust', 'php', 'swift', 'kotlin', 'css'
+}
+
+# Lines that continue the statement above and never start a part
+CONTINUATION_PATTERN = re.compile(r'(?:else|elif|except|finally|ensure|rescue|when|end|catch)\b|[{}.)\]]')
+
+BRACKET_PATTERN = re.compile(r'[()\[\]{}]')
+
+# Review fields holding line references, and the references in free text
+LINE_FIELDS = ('line', 'lines', 'location')
+LINE_NUMBERS_PATTERN = re.compile(r'^\s*(?:lines?\s*)?\d+(?:\s*(?:-|–|,|to|and)\s*\d+)*\s*$', re.IGNORECASE)
+LINE_MENTION_PATTERN = re.compile(r'\b(lines?\s+)(\d+)(?:(\s*(?:-|–|to)\s*)(\d+))?', re.IGNORECASE)
+SCORE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*/\s*10\b')
+
+
+class Chunk:
+    """One part of a larger input"""
+
+    def __init__(self, code, start_line):
+        self.code = code
+        self.start_line = start_line
+        self.line_count = code.count('\n') + 1
+
+    @property
+    def end_line(self):
+        return self.start_line + self.line_count - 1
+
+
+def split_code(code, language, max_chars):
+    """Split code into Chunks of at most max_chars where possible (lines are never split)"""
+    lines = code.split('\n')
+    if len(code) <= max_chars:
+        return [Chunk(code, 1)]
+    levels = _line_levels(code, lines, language)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+
+    def size(lo, hi):
+        return offsets[hi] - offsets[lo]
+
+    def split(lo, hi):
+        if size(lo, hi) <= max_chars:
+            return [(lo, hi)]
+        candidates = [i for i in range(lo + 1, hi) if levels[i] is not None]
+        if candidates:
+            shallowest = min(levels[i] for i in candidates)
+            cuts = [i for i in candidates if levels[i] == shallowest]
+        else:
+            # Nowhere safe to cut: fall back to whole lines
+            cuts = list(range(lo + 1, hi))
+        bounds = [lo] + cuts + [hi]
+        ranges = []
+        start = end = lo
+        for segment_start, segment_end in zip(bounds, bounds[1:]):
+            if size(start, segment_end) <= max_chars:
+                end = segment_end
+                continue
+            if size(segment_start, segment_end) > max_chars and candidates:
+                pieces = split(segment_start, segment_end)
+                # The segment's first piece may still fit behind the current part
+                if end > start and size(start, pieces[0][1]) <= max_chars:
+                    pieces[0] = (start, pieces[0][1])
+                elif end > start:
+                    ranges.append((start, end))
+                ranges.extend(pieces[:-1])
+                start, end = pieces[-1]
+            else:
+                if end > start:
+                    ranges.append((start, end))
+                start, end = segment_start, segment_end
+        if end > start:
+            ranges.append((start, end))
+        return ranges
+
+    return [Chunk('\n'.join(lines[lo:hi]), lo + 1) for lo, hi in split(0, len(lines))]
+
+
+def _line_levels(code, lines, language):
+    """
+    Nesting level at the start of every line, or None where a part must not
+    start: blank lines, lines inside strings or open brackets, continuations,
+    and lines right after a decorator or comment that belongs to them
+    """
+    lexer = lexer_for(language)
+    lexed = lexer.lex(code) if lexer is not None else None
+    braces = language in BRACE_LANGUAGES
+    brackets = [m.start() for m in BRACKET_PATTERN.finditer(code) if lexed is None or lexed.in_code(m.start())]
+
+    levels = []
+    depth = {'(': 0, '[': 0, '{': 0}
+    closers = {')': '(', ']': '[', '}': '{'}
+    position = 0
+    next_bracket = 0
+    attached = False
+    previous_continues = False
+    for line in lines:
+        # Bracket depth at the start of this line
+        while next_bracket < len(brackets) and brackets[next_bracket] < position:
+            char = code[brackets[next_bracket]]
+            if char in depth:
+                depth[char] += 1
+            else:
+                depth[closers[char]] = max(depth[closers[char]] - 1, 0)
+            next_bracket += 1
+        stripped = line.lstrip()
+        first = position + len(line) - len(stripped)
+        position += len(line) + 1
+
+        if not stripped:
+            levels.append(None)
+            continue
+        kind = lexed.kind_at(first) if lexed is not None else None
+        open_brackets = depth['('] + depth['['] + (0 if braces else depth['{'])
+        if (kind == STRING or open_brackets or previous_continues or attached
+                or CONTINUATION_PATTERN.match(stripped)):
+            level = None
+        elif braces:
+            level = depth['{']
+        else:
+            level = len(line.expandtabs(4)) - len(stripped)
+        levels.append(level)
+        # Decorators and leading comments stay with the code below them
+        attached = stripped.startswith('@') or kind == COMMENT
+        previous_continues = stripped.endswith('\\')
+    return levels
+
+
+def merge_reviews(chunks, reviews):
+    """
+    Merge the reviews of every chunk into one review of the whole input
+    Returns None if no chunk has a usable review
+    """
+    parts = [(chunk, review) for chunk, review in zip(chunks, reviews)
+             if review and not review.get('is_fallback')]
+    if not parts:
+        return None
+    failed = [chunk for chunk, review in zip(chunks, reviews) if not review or review.get('is_fallback')]
+
+    keys = []
+    for _, review in parts:
+        keys.extend(key for key in review if key not in keys)
+    merged = {}
+    for key in keys:
+        values = [(chunk, review[key]) for chunk, review in parts if key in review]
+        if key == 'summary':
+            merged[key] = _merge_summaries(values)
+        else:
+            merged[key] = _merge_values(values)
+
+    merged['chunks'] = {
+        'parts': len(chunks),
+        'failed': len(failed),
+        'lines': [[chunk.start_line, chunk.end_line] for chunk in chunks]
+    }
+    if failed:
+        # Not complete, so never cached; the failed parts are retried next time
+        merged['partial'] = True
+        ranges = ', '.join(f'{chunk.start_line}-{chunk.end_line}' for chunk in failed)
+        merged['summary'] = f"⚠️ {len(failed)} of {len(chunks)} parts could not be reviewed (lines {ranges}).\n\n{merged.get('summary', '')}"
+    return merged
+
+
+def _merge_summaries(values):
+    if len(values) == 1:
+        return values[0][1]
+    return '\n\n'.join(f"Lines {chunk.start_line}-{chunk.end_line}: {summary}" for chunk, summary in values)
+
+
+def _merge_values(values):
+    """Merge one field across parts: lists concatenate, scores average by lines, dicts recurse"""
+    present = [(chunk, value) for chunk, value in values if value is not None]
+    if not present:
+        return None
+    if all(isinstance(value, list) for _, value in present):
+        merged, seen = [], set()
+        for chunk, value in present:
+            for item in value:
+                item = _remap_item(item, chunk.start_line - 1)
+                key = json.dumps(item, sort_keys=True, default=str).lower()
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(item)
+        return merged
+    if all(isinstance(value, dict) for _, value in present):
+        keys = []
+        for _, value in present:
+            keys.extend(key for key in value if key not in keys)
+        return {key: _merge_values([(chunk, value.get(key)) for chunk, value in present]) for key in keys}
+
+    scores = [(_score(value), chunk.line_count) for chunk, value in present]
+    if all(score is not None for score, _ in scores):
+        total = sum(weight for _, weight in scores)
+        return f"{round(sum(score * weight for score, weight in scores) / total)}/10"
+    # Anything else: the largest part speaks for the whole
+    return max(present, key=lambda entry: entry[0].line_count)[1]
+
+
+def _score(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        match = SCORE_PATTERN.match(value)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _remap_item(item, offset):
+    if not offset or not isinstance(item, dict):
+        return item
+    item = dict(item)
+    for field in LINE_FIELDS:
+        if field in item:
+            item[field] = remap_lines(item[field], offset)
+    return item
+
+
+def remap_lines(value, offset):
+    """Shift the line numbers in a line reference ("12", "Lines 3-5", "in line 7") by offset"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value + offset
+    if not isinstance(value, str):
+        return value
+    if LINE_NUMBERS_PATTERN.match(value):
+        return re.sub(r'\d+', lambda m: str(int(m.group()) + offset), value)
+
+    def shift(match):
+        text = match.group(1) + str(int(match.group(2)) + offset)
+        if match.group(4):
+            text += match.group(3) + str(int(match.group(4)) + offset)
+        return text
+    return LINE_MENTION_PATTERN.sub(shift, value)
@@ -15,6 +15,57 @@ class Config:
     
     # API Keys
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+    # Seconds /api/analyze waits for Gemini before answering with the ML result alone
+    GEMINI_DEADLINE = float(os.getenv('GEMINI_DEADLINE', 45))
+    ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 8))
+    # AI backend: 'gemini', or 'stub' to answer offline (load tests)
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'gemini')
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))  # per request, seconds
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+    LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))  # requests in flight per process
+    LLM_RECORD_PATH = os.getenv('LLM_RECORD_PATH', '')  # append responses here for the stub to replay
+    LLM_STUB_REPLAY_PATH = os.getenv('LLM_STUB_REPLAY_PATH', '')
+    LLM_STUB_LATENCY = float(os.getenv('LLM_STUB_LATENCY', 0.5))  # seconds
+    LLM_STUB_JITTER = float(os.getenv('LLM_STUB_JITTER', 0.0))  # seconds, deterministic per prompt
+    LLM_STUB_TOKENS_PER_SECOND = float(os.getenv('LLM_STUB_TOKENS_PER_SECOND', 0))  # 0 = no output delay
+    
+    # Repository reviews: small files share one Gemini request
+    GEMINI_BATCH_ENABLED = os.getenv('GEMINI_BATCH_ENABLED', 'True').lower() == 'true'
+    GEMINI_BATCH_TOKENS = int(os.getenv('GEMINI_BATCH_TOKENS', 6000))  # prompt tokens of code per batch
+    GEMINI_BATCH_FILES = int(os.getenv('GEMINI_BATCH_FILES', 6))
+    GEMINI_BATCH_FILE_TOKENS = int(os.getenv('GEMINI_BATCH_FILE_TOKENS', 1500))  # larger files are reviewed alone
+    GEMINI_BATCH_OUTPUT_TOKENS = int(os.getenv('GEMINI_BATCH_OUTPUT_TOKENS', 32000))
+    # Single reviews: code up to these sizes gets the compact schema and a smaller output budget
+    GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS', 8000))
+    PROMPT_COMPACT_MAX_LINES = int(os.getenv('PROMPT_COMPACT_MAX_LINES', 60))
+    PROMPT_COMPACT_MAX_BYTES = int(os.getenv('PROMPT_COMPACT_MAX_BYTES', 2500))
+    PROMPT_STRIP_COMMENTS = os.getenv('PROMPT_STRIP_COMMENTS', 'True').lower() == 'true'
+    # Longer inputs are split at function/class boundaries and reviewed in parts
+    GEMINI_CHUNK_CHARS = int(os.getenv('GEMINI_CHUNK_CHARS', 12000))
+    GEMINI_CHUNK_WORKERS = int(os.getenv('GEMINI_CHUNK_WORKERS', 4))
+    
+    # Static analysis: parse Python with the AST backend (exact positions and real
+    # cyclomatic complexity) instead of the single-pass string scan, which is faster
+    PYTHON_AST_ANALYSIS = os.getenv('PYTHON_AST_ANALYSIS', 'False').lower() == 'true'
+    
+    # CodeBERT embeddings: concurrent requests are batched by one thread per process
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 32))  # snippets per batch
+    EMBEDDING_MICRO_BATCH = int(os.getenv('EMBEDDING_MICRO_BATCH', 8))  # 512-token windows per forward pass
+    EMBEDDING_MAX_WAIT_MS = float(os.getenv('EMBEDDING_MAX_WAIT_MS', 10))  # wait for more requests to batch
+    TORCH_NUM_THREADS = int(os.getenv('TORCH_NUM_THREADS', 0))  # 0 = torch default (one per core)
+    # 'torch' runs the fp32 model; 'torchscript' or 'onnx' (needs onnx and onnxruntime)
+    # an int8-quantized export, created once by model_export.py in EMBEDDING_EXPORT_DIR
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+    EMBEDDING_EXPORT_DIR = os.getenv('EMBEDDING_EXPORT_DIR', 'cache/models')
+    # Share the fp32 weights between gunicorn workers: memory-map them from
+    # EMBEDDING_EXPORT_DIR, and/or load them in the master before it forks
+    EMBEDDING_MMAP_WEIGHTS = os.getenv('EMBEDDING_MMAP_WEIGHTS', 'False').lower() == 'true'
+    PRELOAD_MODEL = os.getenv('PRELOAD_MODEL', 'False').lower() == 'true'
+    # Load and warm up CodeBERT in the background at startup; until it is ready
+    # embeddings are skipped (degraded). Off: it loads on first use instead.
+    # No request path uses embeddings yet, so by default no worker loads torch
+    MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'False').lower() == 'true'
     
     # Firebase Configuration
     FIREBASE_CONFIG = {
@@ -27,6 +78,12 @@ class Config:
         'measurementId': os.getenv('FIREBASE_MEASUREMENT_ID')
     }
     
+    # Gunicorn (see gunicorn.conf.py): threaded workers, so an event stream or a long
+    # analysis occupies one thread rather than a whole worker process
+    GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', 2))
+    GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', 8))  # requests in flight per worker
+    GUNICORN_TIMEOUT = int(os.getenv('GUNICORN_TIMEOUT', 120))  # raised to fit the request deadlines, seconds
+    
     # Security
     MAX_CODE_LENGTH = int(os.getenv('MAX_CODE_LENGTH', 50000))
     ALLOWED_ORIGINS = os.getenv('ALLOWED_ORIGINS', 'http://localhost:5000').split(',')
@@ -38,9 +95,56 @@ class Config:
     RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True').lower() == 'true'
     RATELIMIT_STORAGE_URL = os.getenv('RATELIMIT_STORAGE_URL', 'memory://')
     
-    # Caching
-    CACHE_TYPE = os.getenv('CACHE_TYPE', 'simple')
+    # Repository analysis budget and concurrency
+    GITHUB_MAX_FILES = int(os.getenv('GITHUB_MAX_FILES', 300))
+    GITHUB_TIME_BUDGET = float(os.getenv('GITHUB_TIME_BUDGET', 60))  # seconds
+    GITHUB_FETCH_WORKERS = int(os.getenv('GITHUB_FETCH_WORKERS', 8))
+    GITHUB_AI_WORKERS = int(os.getenv('GITHUB_AI_WORKERS', 4))
+    GITHUB_MAX_IN_FLIGHT = int(os.getenv('GITHUB_MAX_IN_FLIGHT', 16))
+    GITHUB_MAX_BYTES = int(os.getenv('GITHUB_MAX_BYTES', 2 * 1024 * 1024))  # content analyzed per request
+    
+    # Repository download: 'archive' reads one tarball, 'contents' fetches file by file
+    GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+    GITHUB_FETCH_MODE = os.getenv('GITHUB_FETCH_MODE', 'archive')
+    GITHUB_MAX_FILE_BYTES = int(os.getenv('GITHUB_MAX_FILE_BYTES', 50000))
+    GITHUB_MAX_ARCHIVE_BYTES = int(os.getenv('GITHUB_MAX_ARCHIVE_BYTES', 200 * 1024 * 1024))
+    
+    # GitHub API client: pooled connections, conditional requests, retries
+    GITHUB_POOL_SIZE = int(os.getenv('GITHUB_POOL_SIZE', 16))
+    GITHUB_MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', 3))
+    GITHUB_RATE_LIMIT_WAIT = float(os.getenv('GITHUB_RATE_LIMIT_WAIT', 30))  # longest wait for a reset, seconds
+    GITHUB_CACHE_FRESH = int(os.getenv('GITHUB_CACHE_FRESH', 60))  # served without revalidation, seconds
+    GITHUB_CACHE_TIMEOUT = int(os.getenv('GITHUB_CACHE_TIMEOUT', 86400))  # ETag entries kept, seconds
+    GITHUB_CACHE_MEMORY_ITEMS = int(os.getenv('GITHUB_CACHE_MEMORY_ITEMS', 64))
+    
+    # Incremental repository analysis: results indexed by git blob SHA
+    REPO_INDEX_PATH = os.getenv('REPO_INDEX_PATH', 'cache/repo_index.sqlite3')
+    REPO_INDEX_MAX_AGE = int(os.getenv('REPO_INDEX_MAX_AGE', 30 * 86400))  # unused blobs dropped after, seconds
+    
+    # Background jobs: whole-repository analyses outside the request cycle
+    JOB_QUEUE_PATH = os.getenv('JOB_QUEUE_PATH', 'cache/jobs.sqlite3')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))  # per gunicorn worker process
+    JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 120))  # requeue jobs without a heartbeat, seconds
+    JOB_RETENTION = int(os.getenv('JOB_RETENTION', 86400))  # finished jobs kept, seconds
+    JOB_GITHUB_MAX_FILES = int(os.getenv('JOB_GITHUB_MAX_FILES', 2000))
+    JOB_GITHUB_MAX_BYTES = int(os.getenv('JOB_GITHUB_MAX_BYTES', 20 * 1024 * 1024))
+    JOB_GITHUB_TIME_BUDGET = float(os.getenv('JOB_GITHUB_TIME_BUDGET', 900))  # seconds
+    
+    # Caching (memory LRU per worker, SQLite file shared by all workers)
     CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 3600))
+    RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH', 'cache/results.sqlite3')
+    RESULT_CACHE_MEMORY_ITEMS = int(os.getenv('RESULT_CACHE_MEMORY_ITEMS', 256))
+    RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', 104857600))  # 100MB
+    # ML results are cheap to recompute; Gemini results are expensive and kept longer
+    ML_CACHE_TIMEOUT = int(os.getenv('ML_CACHE_TIMEOUT', 600))
+    AI_CACHE_TIMEOUT = int(os.getenv('AI_CACHE_TIMEOUT', 604800))  # 7 days
+    # Identical in-flight Gemini analyses share one call, across workers via lock files
+    SINGLE_FLIGHT_LOCK_DIR = os.getenv('SINGLE_FLIGHT_LOCK_DIR', 'cache/locks')
+    SINGLE_FLIGHT_TIMEOUT = int(os.getenv('SINGLE_FLIGHT_TIMEOUT', 120))
+    # Part of each layer's cache keys - bump when that layer's output changes
+    # (rule pack edits are picked up automatically, see RuleEngine.fingerprint)
+    ML_ANALYSIS_VERSION = '6'
+    AI_ANALYSIS_VERSION = '2'
     
     # Logging
     LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -63,6 +167,8 @@ class TestingConfig(Config):
     DEBUG = False
     TESTING = True
     RATELIMIT_ENABLED = False
+    RESULT_CACHE_PATH = ''  # Memory tier only
+    REPO_INDEX_PATH = ''  # Always analyze from scratch
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,109 @@
+"""
+Dynamic batching of CodeBERT embedding requests
+Callers on any thread queue their snippets; one worker thread per process
+collects them until a batch is full or the oldest request has waited
+max_wait, then embeds the whole batch with a single call, which the model
+splits into length-sorted, padded micro-batches
+No request path uses embeddings yet (the ML analysis is rule/AST based);
+this is the entry point for the first feature that does, and
+`benchmark.py embeddings` measures it until then
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class EmbeddingService:
+    """Queue in front of a batch embedding function: embed_batch(codes) -> one vector per code"""
+
+    def __init__(self, embed_batch, max_batch_size=32, max_wait=0.01, logger=None):
+        self.embed_batch = embed_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.logger = logger
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self._stats = {
+            'requests': 0,
+            'batches': 0,
+            'failures': 0,
+            'largest_batch': 0
+        }
+
+    def submit(self, code):
+        """Queue one snippet; returns a Future of its embedding vector"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((code, future))
+        return future
+
+    def embed(self, code, timeout=None):
+        """Embedding vector of one snippet, batched with whatever else is queued"""
+        return self.submit(code).result(timeout)
+
+    def embed_many(self, codes, timeout=None):
+        """Embedding vectors of several snippets, in order"""
+        futures = [self.submit(code) for code in codes]
+        return [future.result(timeout) for future in futures]
+
+    def stats(self):
+        """Batching counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['mean_batch'] = round(stats['requests'] / stats['batches'], 2) if stats['batches'] else 0
+        stats['queued'] = self._queue.qsize()
+        return stats
+
+    # ---- Worker ----
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._queue = queue.Queue()
+        threading.Thread(target=self._work, name='embedding-batcher', daemon=True).start()
+
+    def _work(self):
+        while True:
+            batch = self._collect()
+            self._run(batch)
+
+    def _collect(self):
+        """Block for the first request, then take more until the batch is full or max_wait is up"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, batch):
+        # Requests cancelled while queued are not embedded
+        batch = [(code, future) for code, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        with self._lock:
+            self._stats['requests'] += len(batch)
+            self._stats['batches'] += 1
+            self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+        try:
+            vectors = self.embed_batch([code for code, _ in batch])
+        except Exception as e:
+            with self._lock:
+                self._stats['failures'] += 1
+            if self.logger:
+                self.logger.error(f"Embedding batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
@@ -0,0 +1,138 @@
+"""
+Prioritization and budgeting of repository files for analysis
+Files are scored by path, language and size, vendored/generated/minified
+files are dropped, and the best value per byte is packed into the budget
+"""
+
+import re
+
+# Directories whose files are never first-party code
+SKIP_DIRS = {
+    'node_modules', 'bower_components', 'jspm_packages', 'vendor', 'vendors', 'third_party',
+    'third-party', 'external', 'dist', 'build', 'out', 'target', 'obj', 'coverage', '__pycache__',
+    'site-packages', 'venv', 'pods', 'deps', 'generated', '__generated__'
+}
+
+# Minified, bundled and generated files
+SKIP_FILE_PATTERN = re.compile(
+    r'(?:[.-]min\.(?:js|css)$|[.-]bundle\.js$|\.chunk\.js$|_pb2(?:_grpc)?\.py$|\.pb\.go$|'
+    r'\.g\.(?:cs|dart)$|\.generated\.\w+$|\.designer\.cs$|_generated\.\w+$)',
+    re.IGNORECASE
+)
+
+# Worth less than application code, but still analyzed if budget allows
+LOW_VALUE_DIRS = {
+    'test', 'tests', '__tests__', 'spec', 'specs', 'testing', 'fixtures', 'mocks', 'examples',
+    'example', 'samples', 'sample', 'docs', 'doc', 'demo', 'demos', 'benchmarks', 'migrations', 'scripts'
+}
+LOW_VALUE_FILE_PATTERN = re.compile(
+    r'(?:^test_|_test\.\w+$|\.(?:test|spec)\.\w+$|^conftest\.py$|^setup\.py$|\.d\.ts$|'
+    r'^__init__\.py$|^(?:webpack|babel|jest|vite|rollup|karma|gulpfile|gruntfile)[.\w-]*\.(?:js|ts)$)',
+    re.IGNORECASE
+)
+
+# Directories and file names that usually hold the core of a project
+HIGH_VALUE_DIRS = {'src', 'lib', 'app', 'apps', 'core', 'api', 'server', 'services', 'pkg', 'internal', 'cmd'}
+ENTRY_POINT_PATTERN = re.compile(r'^(?:main|app|server|index|cli|api|views|models|handlers?|routes?)\.\w+$')
+
+# Languages with dedicated rule packs get the most out of the static analysis
+LANGUAGE_WEIGHTS = {
+    'python': 1.0, 'javascript': 1.0, 'typescript': 1.0, 'java': 1.0, 'go': 1.0, 'rust': 1.0
+}
+DEFAULT_LANGUAGE_WEIGHT = 0.8
+
+# Fixed cost of a file (one API call, one Gemini request) in bytes of content
+FILE_OVERHEAD_BYTES = 2048
+
+# Rough bytes per LLM token for source code
+BYTES_PER_TOKEN = 4
+
+
+def file_priority(path, size, language=None):
+    """Usefulness score of a file (higher is better), or None to skip it"""
+    parts = path.lower().split('/')
+    name = parts[-1]
+    dirs = parts[:-1]
+
+    # Hidden directories (.git, .venv, .next, ...) are tooling, not code
+    if any(part in SKIP_DIRS or part.startswith('.') for part in dirs):
+        return None
+    if SKIP_FILE_PATTERN.search(name) or size == 0:
+        return None
+
+    score = 1.0
+    if any(part in LOW_VALUE_DIRS for part in dirs) or LOW_VALUE_FILE_PATTERN.search(name):
+        score *= 0.3
+    if any(part in HIGH_VALUE_DIRS for part in dirs):
+        score *= 1.3
+    if ENTRY_POINT_PATTERN.match(name):
+        score *= 1.2
+    # Deeply nested files tend to be helpers and leaves
+    score *= 1.0 / (1 + 0.1 * max(len(dirs) - 2, 0))
+    score *= LANGUAGE_WEIGHTS.get(language, DEFAULT_LANGUAGE_WEIGHT)
+
+    # Tiny files hold little to find; past a few KB more code means more
+    # findings, but with diminishing returns
+    if size < 200:
+        score *= 0.3
+    elif size < 1000:
+        score *= 0.7
+    else:
+        score *= min(1.0 + (size - 1000) / 20000, 1.5)
+    return score
+
+
+def schedule_files(files, max_files, max_bytes, language_of=None, free=()):
+    """
+    Pick the files to analyze and the order to analyze them in
+
+    `files` are tree items with 'path' and 'size'. Files are ranked by score,
+    or by value per byte (content plus a fixed per-file overhead) when the
+    byte budget is the tighter limit, and packed greedily into max_bytes and
+    max_files; paths in `free` (results already known) cost nothing against
+    the byte budget. The selection comes back in order
+    of descending score, so a time budget that runs out cuts the least
+    useful files. Returns (selected, stats).
+    """
+    free = set(free)
+    candidates = []
+    skipped = 0
+    for item in files:
+        size = item.get('size', 0)
+        score = file_priority(item['path'], size, language_of(item) if language_of else None)
+        if score is None:
+            skipped += 1
+            continue
+        cost = 0 if item['path'] in free else size + FILE_OVERHEAD_BYTES
+        candidates.append((score / cost if cost else float('inf'), score, cost, item))
+
+    # If the best files by score fit the byte budget the file cap is what
+    # binds, so take them as they are; otherwise pack by value per byte
+    candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+    if sum(cost for _, _, cost, _ in candidates[:max_files]) > max_bytes:
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+    selected = []
+    used_bytes = 0
+    over_budget = 0
+    for _, score, cost, item in candidates:
+        if len(selected) >= max_files:
+            over_budget += 1
+            continue
+        if used_bytes + cost > max_bytes:
+            over_budget += 1
+            continue
+        selected.append((score, item))
+        used_bytes += cost
+
+    selected.sort(key=lambda entry: entry[0], reverse=True)
+    content_bytes = sum(item.get('size', 0) for _, item in selected if item['path'] not in free)
+    stats = {
+        'candidates': len(files),
+        'skipped': skipped,
+        'over_budget': over_budget,
+        'selected': len(selected),
+        'selected_bytes': content_bytes,
+        'estimated_tokens': content_bytes // BYTES_PER_TOKEN,
+        'byte_budget': max_bytes
+    }
+    return [item for _, item in selected], stats
@@ -0,0 +1,70 @@
+"""
+Batched multi-file prompts for Gemini code reviews
+Several small files share one request: the review instructions are sent
+once, every file gets a numbered section, and the model answers with one
+delimited JSON section per file that is split back into per-file results
+"""
+
+import re
+
+# Rough bytes per token for source code
+BYTES_PER_TOKEN = 4
+
+# Header, fences and answer delimiters around each file
+FILE_OVERHEAD_TOKENS = 40
+
+SECTION_PATTERN = re.compile(r'<<<FILE (\d+)>>>(.*?)<<<END FILE \1>>>', re.DOTALL)
+
+
+def estimate_tokens(code):
+    """Rough prompt tokens for one file, including its section overhead"""
+    return len(code) // BYTES_PER_TOKEN + FILE_OVERHEAD_TOKENS
+
+
+class BatchPrompter:
+    """Builds shared prompts for small files and splits the replies (RepoPipeline groups the files)"""
+
+    def __init__(self, schema, rules, max_batch_tokens=6000, max_batch_files=6, max_file_tokens=1500):
+        self.schema = schema
+        self.rules = rules
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_files = max_batch_files
+        self.max_file_tokens = max_file_tokens
+
+    def cost(self, code):
+        """Prompt tokens of a file in a batch, or None if it should be reviewed alone"""
+        tokens = estimate_tokens(code)
+        return tokens if tokens <= self.max_file_tokens else None
+
+    def build_prompt(self, files):
+        """One prompt reviewing every (path, language, code) file"""
+        sections = []
+        for number, (path, language, code) in enumerate(files, 1):
+            sections.append(f"### FILE {number}: {path} ({language})\n```{language}\n{code}\n```")
+        answer_format = '\n'.join(
+            f"<<<FILE {number}>>>\n{{ review JSON for file {number} }}\n<<<END FILE {number}>>>"
+            for number in range(1, len(files) + 1)
+        )
+        return f"""You are an expert code reviewer with 15+ years of experience. Review each of the {len(files)} files below independently and provide a detailed code review of every file in JSON format.
+
+{chr(10).join(sections)}
+
+For EVERY file return one JSON object with this EXACT structure:
+{self.schema}
+
+Answer with one section per file, in this exact format and nothing else:
+{answer_format}
+
+Line numbers refer to lines within that file. Keep each review focused; files are small, so prefer a few precise findings over long lists.
+
+{self.rules.format(language="each file's language")}
+"""
+
+    def split_response(self, text, count):
+        """Map file number (1-based) to the raw JSON text of its section"""
+        sections = {}
+        for match in SECTION_PATTERN.finditer(text):
+            number = int(match.group(1))
+            if 1 <= number <= count:
+                sections[number] = match.group(2).strip()
+        return sections
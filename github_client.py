@@ -0,0 +1,190 @@
+"""
+Shared HTTP client for the GitHub API
+One pooled keep-alive session per worker, ETag conditional requests backed
+by the result cache, and retries that respect GitHub's rate-limit headers
+"""
+
+import hashlib
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Server errors worth another attempt
+RETRY_STATUSES = {500, 502, 503, 504}
+
+
+class GitHubResponse:
+    """Status, headers and decoded JSON body of one API call"""
+
+    def __init__(self, status_code, headers, data, from_cache=False):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+        self.from_cache = from_cache
+
+    def json(self):
+        return self.data
+
+
+class GitHubClient:
+    """Pooled, cached and rate-limit aware GitHub API client"""
+
+    def __init__(self, api_url, cache=None, pool_size=16, max_retries=3, backoff=0.5,
+                 max_rate_limit_wait=30, fresh_for=60, cache_timeout=86400, timeout=30):
+        self.api_url = api_url.rstrip('/')
+        self.cache = cache
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_rate_limit_wait = max_rate_limit_wait
+        self.fresh_for = fresh_for
+        self.cache_timeout = cache_timeout
+        self.timeout = timeout
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'requests': 0,
+            'fresh_hits': 0,
+            'not_modified': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'rate_limit_remaining': None
+        }
+
+    @property
+    def session(self):
+        """The keep-alive session for this process (sockets must not cross a fork)"""
+        with self._lock:
+            if self._session is None or self._pid != os.getpid():
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+                self._pid = os.getpid()
+            return self._session
+
+    # ---- Public API ----
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        """
+        GET with retries, returning the requests.Response
+        Same call shape as requests.get, so it can stand in for a session
+        """
+        url = self._url(url)
+        timeout = timeout or self.timeout
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.get(url, headers=headers, stream=stream, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self._count('retries')
+                time.sleep(self._backoff(attempt))
+                continue
+            self._count('requests')
+            self._note_rate_limit(response)
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt == self.max_retries:
+                return response
+            response.close()
+            self._count('retries')
+            time.sleep(delay)
+
+    def get_json(self, url, headers=None, timeout=None, cache=True):
+        """
+        GET a JSON resource through the response cache
+        Fresh entries are served without a request; older ones are revalidated
+        with If-None-Match, and a 304 does not count against the rate limit
+        """
+        url = self._url(url)
+        headers = dict(headers or {})
+        key = self._cache_key(url, headers) if cache and self.cache is not None else None
+        cached = self.cache.get(key) if key else None
+
+        if cached is not None:
+            if time.time() - cached['fetched'] < self.fresh_for:
+                self._count('fresh_hits')
+                return GitHubResponse(200, {'ETag': cached['etag']}, cached['data'], from_cache=True)
+            headers['If-None-Match'] = cached['etag']
+
+        response = self.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            self._count('not_modified')
+            cached['fetched'] = time.time()
+            self.cache.set(key, cached, timeout=self.cache_timeout)
+            return GitHubResponse(200, response.headers, cached['data'], from_cache=True)
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        etag = response.headers.get('ETag')
+        if key and response.status_code == 200 and etag:
+            self.cache.set(key, {'etag': etag, 'data': data, 'fetched': time.time()}, timeout=self.cache_timeout)
+        return GitHubResponse(response.status_code, response.headers, data)
+
+    def stats(self):
+        """Request, cache and rate-limit counters for this process"""
+        with self._lock:
+            return dict(self._stats)
+
+    # ---- Internals ----
+
+    def _url(self, url):
+        return url if url.startswith(('http://', 'https://')) else f'{self.api_url}/{url.lstrip("/")}'
+
+    def _cache_key(self, url, headers):
+        # Responses differ per token (private repos), so the credential is
+        # part of the key - hashed, never stored
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (url, headers.get('Accept', ''), headers.get('Authorization', '')):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return f'github:{digest.hexdigest()}'
+
+    def _backoff(self, attempt):
+        # Exponential backoff with jitter so workers do not retry in lockstep
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 4)
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying, or None to return the response"""
+        status = response.status_code
+        if status in (403, 429):
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                # Secondary rate limit
+                wait = _to_float(retry_after, 0)
+            elif response.headers.get('X-RateLimit-Remaining') == '0':
+                wait = _to_float(response.headers.get('X-RateLimit-Reset'), 0) - time.time()
+            else:
+                return None  # Plain permission error
+            self._count('rate_limited')
+            if wait > self.max_rate_limit_wait:
+                return None  # Let the caller report the rate limit
+            return max(wait, 0) + random.random() / 4
+        if status in RETRY_STATUSES:
+            return self._backoff(attempt)
+        return None
+
+    def _note_rate_limit(self, response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is not None:
+            with self._lock:
+                self._stats['rate_limit_remaining'] = int(_to_float(remaining, 0))
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+def _to_float(value, default):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,28 @@
+"""
+Gunicorn settings, read from the working directory by `gunicorn app:app`
+"""
+from config import get_config
+
+config = get_config()
+
+# Threaded workers: /api/analyze/stream and job event streams stay open for
+# a while, and on sync workers each one would take a whole process
+worker_class = 'gthread'
+workers = config.GUNICORN_WORKERS
+threads = config.GUNICORN_THREADS
+
+# Never kill a worker before its slowest request can finish: a Gemini wait
+# (GEMINI_DEADLINE) or a repository analysis (GITHUB_TIME_BUDGET), plus the
+# fetching and local analysis around them
+timeout = max(config.GUNICORN_TIMEOUT, int(max(config.GEMINI_DEADLINE, config.GITHUB_TIME_BUDGET)) + 30)
+
+# With PRELOAD_MODEL the app, and CodeBERT with it, is loaded once in the
+# master and forked into the workers, which share its weight pages
+preload_app = config.PRELOAD_MODEL
+
+
+def post_fork(server, worker):
+    # The preloaded model is warmed up in each worker, never in the master
+    if preload_app and config.MODEL_WARMUP:
+        from ml_model import code_analyzer
+        code_analyzer.start_warm_up()
@@ -0,0 +1,284 @@
+"""
+Durable background job queue for long-running analyses
+Jobs live in a SQLite file shared by every gunicorn worker; each worker
+process runs a small thread pool that claims queued jobs, reports progress
+while they run and stores their result
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    status TEXT NOT NULL,
+    progress BLOB,
+    result BLOB,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    pinned TEXT,
+    worker TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, created);
+"""
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobError(Exception):
+    """A job failed in a way worth reporting to the client as-is"""
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+
+class JobQueue:
+    """SQLite-backed job queue with a per-process worker pool"""
+
+    def __init__(self, path, workers=2, poll_interval=1.0, stale_after=120, max_attempts=2,
+                 retention=86400, progress_interval=0.5, logger=None):
+        self.path = path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.progress_interval = progress_interval
+        self.logger = logger
+        self._handlers = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._started_pid = None
+        self._instance = None
+        # Credentials are never written to disk; they stay with the process
+        # that accepted the job, which is the only one allowed to run it
+        self._secrets = {}
+
+    # ---- Public API ----
+
+    def register(self, kind, handler):
+        """handler(payload, secrets, report_progress) returns a JSON-serializable result"""
+        self._handlers[kind] = handler
+
+    def submit(self, kind, payload, secrets=None):
+        """Queue a job and return its id"""
+        if kind not in self._handlers:
+            raise ValueError(f'Unknown job kind: {kind}')
+        self._ensure_workers()
+        job_id = uuid.uuid4().hex
+        pinned = None
+        if secrets:
+            with self._lock:
+                self._secrets[job_id] = secrets
+            pinned = self._instance
+        self._execute(
+            'INSERT INTO jobs (id, kind, payload, status, pinned, created) VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, kind, _dump(payload), QUEUED, pinned, time.time())
+        )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id):
+        """Public view of a job, or None if it does not exist"""
+        rows = self._execute(
+            'SELECT id, kind, status, progress, result, error, attempts, created, started, finished '
+            'FROM jobs WHERE id = ?', (job_id,)
+        )
+        if not rows:
+            return None
+        job_id, kind, status, progress, result, error, attempts, created, started, finished = rows[0]
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'status': status,
+            'progress': json.loads(progress) if progress else {},
+            'error': error,
+            'attempts': attempts,
+            'created': created,
+            'started': started,
+            'finished': finished,
+            'result': json.loads(result) if result else None
+        }
+        if status == QUEUED:
+            job['queue_position'] = self._queue_position(created)
+        return job
+
+    def stats(self):
+        """Job counts by state, plus this process's worker count"""
+        rows = self._execute('SELECT status, COUNT(*) FROM jobs GROUP BY status') or []
+        stats = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED)}
+        stats.update(dict(rows))
+        stats['workers'] = self.workers if self._started_pid == os.getpid() else 0
+        return stats
+
+    # ---- Workers ----
+
+    def _ensure_workers(self):
+        # Threads do not survive a fork, so each gunicorn worker starts its own
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._instance = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+            self._secrets = {}
+        self._recover()
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True).start()
+        threading.Thread(target=self._maintain, name='job-maintenance', daemon=True).start()
+
+    def start(self):
+        """Start this process's workers so it also runs jobs submitted elsewhere"""
+        self._ensure_workers()
+
+    def _work(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(*job)
+
+    def _claim(self):
+        """Atomically move the oldest runnable job to running"""
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = conn.execute(
+                    'SELECT id, kind, payload FROM jobs WHERE status = ? AND (pinned IS NULL OR pinned = ?) '
+                    'ORDER BY created LIMIT 1', (QUEUED, self._instance)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    conn.execute(
+                        'UPDATE jobs SET status = ?, worker = ?, started = ?, heartbeat = ?, attempts = attempts + 1 '
+                        'WHERE id = ?', (RUNNING, self._instance, now, now, row[0])
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            self._log(f"Job queue error: {e}")
+            return None
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def _run(self, job_id, kind, payload):
+        with self._lock:
+            secrets = self._secrets.pop(job_id, None) or {}
+        last_report = [0.0]
+
+        def report_progress(progress, force=False):
+            # Throttled: pipelines report after every file
+            now = time.time()
+            if not force and now - last_report[0] < self.progress_interval:
+                return
+            last_report[0] = now
+            self._execute('UPDATE jobs SET progress = ?, heartbeat = ? WHERE id = ?',
+                          (_dump(progress), now, job_id))
+
+        try:
+            result = self._handlers[kind](payload, secrets, report_progress)
+        except JobError as e:
+            self._finish(job_id, FAILED, e.result, str(e))
+        except Exception as e:
+            self._log(f"Job {job_id} failed: {e}")
+            self._finish(job_id, FAILED, None, str(e))
+        else:
+            self._finish(job_id, DONE, result, None)
+
+    def _finish(self, job_id, status, result, error):
+        self._execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, finished = ? WHERE id = ?',
+            (status, _dump(result) if result is not None else None, error, time.time(), job_id)
+        )
+
+    def _maintain(self):
+        while True:
+            time.sleep(max(self.stale_after / 4, 1))
+            now = time.time()
+            # Long jobs may not report progress for a while; keep them alive
+            self._execute('UPDATE jobs SET heartbeat = ? WHERE status = ? AND worker = ?',
+                          (now, RUNNING, self._instance))
+            self._recover()
+            self._execute('DELETE FROM jobs WHERE status IN (?, ?) AND finished < ?',
+                          (DONE, FAILED, now - self.retention))
+
+    def _recover(self):
+        """Requeue jobs whose worker died; give up after max_attempts"""
+        cutoff = time.time() - self.stale_after
+        self._execute(
+            'UPDATE jobs SET status = ?, finished = ?, error = ? WHERE status = ? AND heartbeat < ? AND attempts >= ?',
+            (FAILED, time.time(), 'Worker stopped while running the job', RUNNING, cutoff, self.max_attempts)
+        )
+        # The credentials died with the worker, so a requeued job runs without them
+        self._execute(
+            'UPDATE jobs SET status = ?, pinned = NULL, worker = NULL WHERE status = ? AND heartbeat < ?',
+            (QUEUED, RUNNING, cutoff)
+        )
+        # A live process either claims its pinned jobs promptly or is busy
+        # with running jobs that heartbeat; otherwise it is gone
+        self._execute(
+            'UPDATE jobs SET pinned = NULL WHERE status = ? AND pinned IS NOT NULL AND created < ? '
+            'AND pinned NOT IN (SELECT worker FROM jobs WHERE status = ? AND heartbeat >= ?)',
+            (QUEUED, cutoff, RUNNING, cutoff)
+        )
+
+    def _queue_position(self, created):
+        rows = self._execute('SELECT COUNT(*) FROM jobs WHERE status = ? AND created < ?', (QUEUED, created))
+        return rows[0][0] + 1 if rows else None
+
+    # ---- SQLite ----
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, sql, params=()):
+        try:
+            return self._connection().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self._log(f"Job queue error: {e}")
+            return None
+
+    def _log(self, message):
+        if self.logger is not None:
+            self.logger.warning(message)
+        else:
+            print(message)
+
+
+def _dump(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
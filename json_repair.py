@@ -0,0 +1,284 @@
+"""
+Tolerant JSON parsing for model replies
+One left-to-right pass that accepts what language models get wrong: raw
+newlines and stray quotes in strings, invalid escapes, trailing or missing
+commas, Python literals, markdown around the object, and replies cut off
+mid-way, whose complete parts are kept
+"""
+
+import re
+
+WHITESPACE = re.compile(r'\s*')
+STRING_BODY = re.compile(r'[^"\\\n\r\t]*')
+SINGLE_QUOTED_BODY = re.compile(r"[^'\\\n\r\t]*")
+NUMBER = re.compile(r'-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?')
+BARE_KEY = re.compile(r'[A-Za-z_$][\w$-]*')
+BARE_VALUE = re.compile(r'[^,}\]\n]*')
+KEY_AHEAD = re.compile(r'"[^"\n]*"\s*:')
+VALUE_AHEAD = re.compile(r'["\'{\[\]}]|-?\d|(?:true|false|null|True|False|None)\b')
+HEX4 = re.compile(r'[0-9a-fA-F]{4}')
+
+LITERALS = {
+    'true': True, 'false': False, 'null': None,
+    'True': True, 'False': False, 'None': None
+}
+ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t', "'": "'"}
+
+# Characters that may follow a number
+NUMBER_ENDERS = frozenset(',}] \t\r\n')
+
+# Deepest nesting parsed; every level costs three Python stack frames
+MAX_DEPTH = 100
+
+
+class JSONRepairError(ValueError):
+    """The text holds no JSON object or array at all, or one nested too deeply"""
+    pass
+
+
+def repair_json(text, start=None):
+    """
+    Parse the JSON value at `start`, repairing it as needed; returns (value, repairs)
+    Without `start`, the first object is parsed, or the first array if there is
+    no object: prose before a reply often holds brackets ("[1/3] Review:")
+    """
+    if start is None:
+        start = text.find('{')
+        if start < 0:
+            start = text.find('[')
+    if start < 0 or text[start:start + 1] not in ('{', '['):
+        raise JSONRepairError('No JSON object found')
+    parser = _Parser(text)
+    _, value = parser.parse(start)
+    return value, parser.repairs
+
+
+class _Parser:
+    """Recursive descent over one string; every method takes and returns a position"""
+
+    def __init__(self, text):
+        self.text = text
+        self.length = len(text)
+        self.repairs = 0
+        self.truncated = False
+        self.closers = []
+
+    def _cut(self):
+        # The reply ends before the value does
+        if not self.truncated:
+            self.truncated = True
+            self.repairs += 1
+
+    def skip(self, pos):
+        return WHITESPACE.match(self.text, pos).end()
+
+    def parse(self, pos):
+        """Parse one value at pos (whitespace already skipped); returns (end, value)"""
+        text = self.text
+        if pos >= self.length:
+            self._cut()
+            return pos, None
+        char = text[pos]
+        if char == '{':
+            return self._object(pos + 1)
+        if char == '[':
+            return self._array(pos + 1)
+        if char == '"':
+            return self._string(pos + 1, '"', STRING_BODY)
+        if char == "'":
+            self.repairs += 1
+            return self._string(pos + 1, "'", SINGLE_QUOTED_BODY)
+        match = NUMBER.match(text, pos)
+        if match and (match.end() >= self.length or text[match.end()] in NUMBER_ENDERS):
+            number = match.group()
+            if match.end() >= self.length:
+                self._cut()
+            return match.end(), float(number) if any(c in number for c in '.eE') else int(number)
+        match = BARE_KEY.match(text, pos)
+        if match and match.group() in LITERALS:
+            if match.group() not in ('true', 'false', 'null'):
+                self.repairs += 1
+            return match.end(), LITERALS[match.group()]
+        # Anything else up to the next delimiter is taken as an unquoted string
+        match = BARE_VALUE.match(text, pos)
+        self.repairs += 1
+        if match.end() >= self.length:
+            self._cut()
+        return match.end(), match.group().strip()
+
+    def _string(self, pos, quote, body):
+        text = self.text
+        parts = []
+        while True:
+            match = body.match(text, pos)
+            parts.append(match.group())
+            pos = match.end()
+            if pos >= self.length:
+                # Cut off inside the string: keep what arrived
+                self._cut()
+                return pos, ''.join(parts)
+            char = text[pos]
+            if char == quote:
+                if self._closes(pos + 1):
+                    return pos + 1, ''.join(parts)
+                # A quote inside the text that should have been escaped
+                self.repairs += 1
+                parts.append(quote)
+                pos += 1
+            elif char == '\\':
+                escape = text[pos + 1:pos + 2]
+                if escape in ESCAPES:
+                    parts.append(ESCAPES[escape])
+                    pos += 2
+                elif escape == 'u' and HEX4.fullmatch(text, pos + 2, pos + 6):
+                    code = int(text[pos + 2:pos + 6], 16)
+                    pos += 6
+                    # Characters outside the BMP come as a surrogate pair
+                    if 0xD800 <= code < 0xDC00 and text.startswith('\\u', pos) and HEX4.fullmatch(text, pos + 2, pos + 6):
+                        low = int(text[pos + 2:pos + 6], 16)
+                        if 0xDC00 <= low < 0xE000:
+                            code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                            pos += 6
+                    parts.append(chr(code))
+                else:
+                    # Invalid escape (regexes, Windows paths): keep it literally
+                    self.repairs += 1
+                    parts.append('\\' + escape)
+                    pos += 1 + len(escape)
+            else:
+                # Raw newline or tab inside the string
+                self.repairs += 1
+                parts.append(char)
+                pos += 1
+
+    def _closes(self, pos):
+        """True if a quote just before pos ends its string, judging by what follows"""
+        text = self.text
+        after = self.skip(pos)
+        if after >= self.length or text[after] == ':':
+            return True
+        char = text[after]
+        if char == ',':
+            # The next element or member has to follow
+            after = self.skip(after + 1)
+            return after >= self.length or bool(VALUE_AHEAD.match(text, after))
+        if char in '}]':
+            # The open container closes, and its parent goes on (or it is the last one)
+            if not self.closers or char != self.closers[-1]:
+                return False
+            after = self.skip(after + 1)
+            return (len(self.closers) == 1 or after >= self.length or text[after] in ','
+                    or bool(VALUE_AHEAD.match(text, after)))
+        # The next member follows without a comma
+        return bool(KEY_AHEAD.match(text, after))
+
+    def _enter(self, closer):
+        if len(self.closers) >= MAX_DEPTH:
+            raise JSONRepairError(f'JSON nested deeper than {MAX_DEPTH} levels')
+        self.closers.append(closer)
+
+    def _object(self, pos):
+        self._enter('}')
+        try:
+            return self._members(pos)
+        finally:
+            self.closers.pop()
+
+    def _members(self, pos):
+        text = self.text
+        result = {}
+        while True:
+            pos = self.skip(pos)
+            while pos < self.length and text[pos] == ',':
+                self.repairs += 1
+                pos = self.skip(pos + 1)
+            if pos >= self.length:
+                self._cut()
+                return pos, result
+            char = text[pos]
+            if char == '}':
+                return pos + 1, result
+            if char == ']':
+                # Mismatched bracket: close the object here
+                self.repairs += 1
+                return pos + 1, result
+
+            if char in '"\'':
+                pos, key = self._string(pos + 1, char, STRING_BODY if char == '"' else SINGLE_QUOTED_BODY)
+                if char == "'":
+                    self.repairs += 1
+            else:
+                match = BARE_KEY.match(text, pos)
+                if not match:
+                    # Garbage between members: skip a character
+                    self.repairs += 1
+                    pos += 1
+                    continue
+                self.repairs += 1
+                pos, key = match.end(), match.group()
+
+            pos = self.skip(pos)
+            if pos < self.length and text[pos] == ':':
+                pos = self.skip(pos + 1)
+            else:
+                self.repairs += 1
+            if pos >= self.length or self.truncated:
+                # Key without a value: the reply stopped here
+                self._cut()
+                return pos, result
+            pos, value = self.parse(pos)
+            if self.truncated and value is None:
+                return pos, result
+            result[key] = value
+            if self.truncated:
+                return pos, result
+
+            pos = self.skip(pos)
+            if pos < self.length and text[pos] == ',':
+                pos += 1
+                # Trailing comma before the closing brace
+                after = self.skip(pos)
+                if after < self.length and text[after] == '}':
+                    self.repairs += 1
+            elif pos < self.length and text[pos] != '}':
+                self.repairs += 1  # Missing comma
+
+    def _array(self, pos):
+        self._enter(']')
+        try:
+            return self._elements(pos)
+        finally:
+            self.closers.pop()
+
+    def _elements(self, pos):
+        text = self.text
+        result = []
+        while True:
+            pos = self.skip(pos)
+            while pos < self.length and text[pos] == ',':
+                self.repairs += 1
+                pos = self.skip(pos + 1)
+            if pos >= self.length:
+                self._cut()
+                return pos, result
+            char = text[pos]
+            if char == ']':
+                return pos + 1, result
+            if char == '}':
+                self.repairs += 1
+                return pos + 1, result
+            pos, value = self.parse(pos)
+            if self.truncated and value is None:
+                return pos, result
+            result.append(value)
+            if self.truncated:
+                return pos, result
+
+            pos = self.skip(pos)
+            if pos < self.length and text[pos] == ',':
+                pos += 1
+                after = self.skip(pos)
+                if after < self.length and text[after] == ']':
+                    self.repairs += 1
+            elif pos < self.length and text[pos] != ']':
+                self.repairs += 1
@@ -0,0 +1,146 @@
+"""
+Streaming lexers that split source code into code, string and comment spans
+Each language gets one combined regex, so a file is classified in a single
+pass and downstream rules only look at real code
+"""
+
+import re
+from bisect import bisect_right
+
+# Span kinds
+CODE = 'code'
+STRING = 'string'
+COMMENT = 'comment'
+
+C_COMMENTS = {'line_comments': ['//'], 'block_comments': [('/*', '*/')]}
+
+# Lexical syntax for every language LanguageDetector knows about.
+# strings: single-line, backslash escapes; multiline_strings: may span lines
+# (delimiters longer than one character are matched up to the same delimiter);
+# raw_strings: may span lines, no escapes; chars: one (escaped) character
+LEXICAL_SPECS = {
+    'python': {'line_comments': ['#'], 'multiline_strings': ['"""', "'''"], 'strings': ['"', "'"]},
+    'javascript': dict(C_COMMENTS, strings=['"', "'"], multiline_strings=['`']),
+    'typescript': dict(C_COMMENTS, strings=['"', "'"], multiline_strings=['`']),
+    'java': dict(C_COMMENTS, multiline_strings=['"""'], strings=['"'], chars=["'"]),
+    'cpp': dict(C_COMMENTS, strings=['"'], chars=["'"]),
+    'csharp': dict(C_COMMENTS, strings=['"'], chars=["'"]),
+    'go': dict(C_COMMENTS, strings=['"'], raw_strings=['`'], chars=["'"]),
+    'rust': dict(C_COMMENTS, multiline_strings=['"'], chars=["'"]),
+    'php': {'line_comments': ['//', '#'], 'block_comments': [('/*', '*/')], 'strings': ['"', "'"]},
+    'ruby': {'line_comments': ['#'], 'strings': ['"', "'"]},
+    'swift': dict(C_COMMENTS, multiline_strings=['"""'], strings=['"']),
+    'kotlin': dict(C_COMMENTS, multiline_strings=['"""'], strings=['"'], chars=["'"]),
+    'sql': {'line_comments': ['--'], 'block_comments': [('/*', '*/')], 'strings': ["'", '"']},
+    'html': {'block_comments': [('<!--', '-->')]},
+    'css': {'block_comments': [('/*', '*/')], 'strings': ['"', "'"]},
+}
+
+
+def _string_pattern(delimiter, multiline=False, escapes=True):
+    q = re.escape(delimiter)
+    if len(delimiter) > 1:
+        return q + r'[\s\S]*?' + q
+    if not escapes:
+        return q + '[^' + q + ']*' + q
+    # Unrolled loop: runs of plain characters are consumed without backtracking
+    if multiline:
+        return q + r'[^' + q + r'\\]*(?:\\[\s\S][^' + q + r'\\]*)*' + q
+    return q + r'[^' + q + r'\\\n]*(?:\\.[^' + q + r'\\\n]*)*' + q
+
+
+class LexedCode:
+    """String and comment spans of one piece of code, searchable by offset"""
+
+    def __init__(self, spans, comment_lines):
+        self.starts = [start for _, start, _ in spans]
+        self.ends = [end for _, _, end in spans]
+        self.kinds = [kind for kind, _, _ in spans]
+        self.comment_lines = comment_lines
+
+    def kind_at(self, pos):
+        """Kind of the span holding an offset"""
+        i = bisect_right(self.starts, pos) - 1
+        if i >= 0 and pos < self.ends[i]:
+            return self.kinds[i]
+        return CODE
+
+    def in_code(self, pos):
+        """True if an offset lies outside every string and comment"""
+        i = bisect_right(self.starts, pos) - 1
+        return i < 0 or pos >= self.ends[i]
+
+
+class Lexer:
+    """Single-regex lexer for one language's strings and comments"""
+
+    def __init__(self, spec):
+        alternatives = []
+        for marker in spec.get('line_comments', []):
+            alternatives.append(re.escape(marker) + r'[^\n]*')
+        for opener, closer in spec.get('block_comments', []):
+            # An unterminated block comment runs to the end of the file
+            alternatives.append(re.escape(opener) + r'[\s\S]*?(?:' + re.escape(closer) + r'|\Z)')
+        for delimiter in spec.get('multiline_strings', []):
+            alternatives.append(_string_pattern(delimiter, multiline=True))
+        for delimiter in spec.get('raw_strings', []):
+            alternatives.append(_string_pattern(delimiter, escapes=False))
+        for delimiter in spec.get('strings', []):
+            alternatives.append(_string_pattern(delimiter))
+        for delimiter in spec.get('chars', []):
+            q = re.escape(delimiter)
+            alternatives.append(q + r'(?:\\[^' + q + r'\n]+|[^\\' + q + r'\n])' + q)
+
+        self._comment_openers = tuple(
+            spec.get('line_comments', []) + [opener for opener, _ in spec.get('block_comments', [])]
+        )
+        # Every alternative starts with a literal, which keeps sre on its fast scan
+        self._matcher = re.compile('|'.join(alternatives)) if alternatives else None
+
+    def iter_spans(self, code):
+        """Yield (kind, start, end) for every string and comment, in order.
+
+        Comment spans include their markers. String spans cover the text
+        between the first and last delimiter characters, so a rule matching a
+        whole literal (e.g. ``"crypto/md5"``) still starts and ends in code,
+        while one reaching into a literal (``"==`` in ``"=="``) does not.
+        """
+        if self._matcher is None:
+            return
+        comment_openers = self._comment_openers
+        for match in self._matcher.finditer(code):
+            start, end = match.span()
+            if comment_openers and code.startswith(comment_openers, start):
+                yield COMMENT, start, end
+            elif end - start > 2:
+                yield STRING, start + 1, end - 1
+
+    def lex(self, code):
+        """Classify a whole piece of code and count its comment lines"""
+        spans = []
+        comment_lines = 0
+        line = 1
+        last_pos = 0
+        last_comment_line = 0
+        for kind, start, end in self.iter_spans(code):
+            spans.append((kind, start, end))
+            if kind is not COMMENT:
+                continue
+            line += code.count('\n', last_pos, start)
+            last_pos = start
+            # A comment line holds nothing but the comment; lines inside a
+            # block comment always count
+            if line > last_comment_line and not code[code.rfind('\n', 0, start) + 1:start].strip():
+                comment_lines += 1
+            extra_lines = code.count('\n', start, end)
+            comment_lines += extra_lines
+            last_comment_line = line + extra_lines
+        return LexedCode(spans, comment_lines)
+
+
+def lexer_for(language):
+    """Get the lexer for a language (None if its syntax is unknown)"""
+    return LEXERS.get(language)
+
+# Global lexer instances - compiled once at import
+LEXERS = {language: Lexer(spec) for language, spec in LEXICAL_SPECS.items()}
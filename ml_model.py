@@ -1,49 +1,203 @@
-import torch
-from transformers import AutoTokenizer, AutoModel
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-import re
+# torch and transformers (and model_export, which needs them) are imported
+# when CodeBERT is first loaded: the static analysis below, and everything
+# that imports this module, starts without the deep-learning stack
+import os
+import threading
+import time
+
+from rule_engine import rule_engine
+from python_analyzer import analyze_python
+
+# Model states: embeddings are only served once it is ready
+IDLE = 'idle'
+LOADING = 'loading'
+LOADED = 'loaded'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+# Warm-up batch of a few lengths, so the first real requests do not pay for
+# one-time setup (allocator growth, kernel selection, TorchScript optimization)
+WARM_UP_SNIPPETS = [
+    "def add(a, b):\n    return a + b",
+    "function total(items) {\n  return items.reduce((sum, item) => sum + item.price, 0);\n}",
+    "class Stack:\n    def __init__(self):\n        self.items = []\n\n    def push(self, item):\n        self.items.append(item)\n" * 8,
+]
+# TorchScript's profiling executor optimizes a graph on its second run
+WARM_UP_RUNS = 2
 
 class CodeAnalyzerModel:
-    def __init__(self):
+    def __init__(self, backend='torch', export_dir='cache/models', mmap_weights=False):
         """Initialize CodeBERT model for code analysis"""
         self.model_name = "microsoft/codebert-base"
         self.tokenizer = None
         self.model = None
         self.loaded = False
+        # 'torch' runs the fp32 model; 'torchscript' and 'onnx' an int8 export
+        # of it from export_dir (see model_export.py)
+        self.backend = backend
+        self.export_dir = export_dir
+        # Memory-map the fp32 weights from export_dir, so processes share them
+        self.mmap_weights = mmap_weights
+        self.encoder = None
+        # CPU threads for inference (None = torch default, one per core)
+        self.num_threads = None
+        # 512-token windows per forward pass
+        self.micro_batch_size = 8
+        # Analyze parseable Python with the AST backend instead of the rule engine
+        # (exact positions and real cyclomatic complexity, but slower)
+        self.python_ast = False
+        # Set to an EmbeddingService to batch concurrent get_code_embedding calls
+        self.embedding_service = None
+        self.state = IDLE
+        self.error = None
+        self.timings = {}
+        self.degraded_calls = 0
+        self._load_lock = threading.Lock()
+        self._warm_up_lock = threading.Lock()
+        self._warm_up_pid = None
+        
+    @property
+    def ready(self):
+        """True once the model is loaded and warmed up"""
+        return self.state == READY
+    
+    def start_warm_up(self):
+        """Load and warm up the model in a background thread, once per process"""
+        with self._warm_up_lock:
+            # Threads do not survive a fork, so each gunicorn worker starts its own
+            if self._warm_up_pid == os.getpid() or self.state in (READY, FAILED):
+                return
+            self._warm_up_pid = os.getpid()
+        threading.Thread(target=self.warm_up, name='model-warm-up', daemon=True).start()
+    
+    def warm_up(self):
+        """Load the model, then run one batch through it"""
+        self.load_model()
+        if not self.loaded:
+            return
+        try:
+            self.state = WARMING
+            started = time.perf_counter()
+            for _ in range(WARM_UP_RUNS):
+                self.get_code_embeddings(WARM_UP_SNIPPETS)
+            self.timings['warm_up_seconds'] = round(time.perf_counter() - started, 2)
+            self.state = READY
+            print("Model warmed up!")
+        except Exception as e:
+            print(f"Error warming up model: {e}")
+            self.error = str(e)
+            self.state = FAILED
+    
+    def status(self):
+        """Warm-up state for health checks"""
+        return {
+            'state': self.state,
+            'ready': self.ready,
+            'backend': self.backend,
+            'error': self.error,
+            'degraded_calls': self.degraded_calls,
+            **self.timings
+        }
         
     def load_model(self):
         """Load the CodeBERT model"""
+        with self._load_lock:
+            if self.loaded:
+                return
+            self._load_model()
+    
+    def _load_model(self):
         try:
             print("Loading CodeBERT model...")
+            self.state = LOADING
+            started = time.perf_counter()
+            import torch
+            from transformers import AutoTokenizer, AutoModel
+            from model_export import TorchEncoder, load_encoder, load_mapped_model
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
             self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModel.from_pretrained(self.model_name)
-            self.model.eval()
+            if self.backend != 'torch':
+                try:
+                    self.encoder = load_encoder(self.model_name, self.backend, self.export_dir, self.num_threads)
+                except Exception as e:
+                    print(f"Error loading {self.backend} export, using the fp32 model: {e}")
+            if self.encoder is None and self.mmap_weights:
+                try:
+                    self.model = load_mapped_model(self.model_name, self.export_dir)
+                    self.encoder = TorchEncoder(self.model)
+                except Exception as e:
+                    print(f"Error mapping model weights, loading them normally: {e}")
+            if self.encoder is None:
+                self.model = AutoModel.from_pretrained(self.model_name)
+                self.model.eval()
+                self.encoder = TorchEncoder(self.model)
             self.loaded = True
+            self.state = LOADED
+            self.timings['load_seconds'] = round(time.perf_counter() - started, 2)
             print("Model loaded successfully!")
         except Exception as e:
             print(f"Error loading model: {e}")
             self.loaded = False
+            self.error = str(e)
+            self.state = FAILED
     
     def get_code_embedding(self, code):
-        """Get embedding vector for code"""
-        if not self.loaded:
-            self.load_model()
-        
+        """
+        Get embedding vector for code
+        Code longer than the model's 512-token window is embedded in
+        consecutive windows, averaged by their token counts
+        Returns None until the model is warmed up, instead of blocking on it
+        """
+        if not self.ready:
+            # Degraded fast path; the first call starts the warm-up
+            self.degraded_calls += 1
+            self.start_warm_up()
+            return None
         try:
-            inputs = self.tokenizer(code, return_tensors="pt", 
-                                   truncation=True, max_length=512, 
-                                   padding=True)
-            
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                embedding = outputs.last_hidden_state.mean(dim=1)
-            
-            return embedding.numpy()
+            if self.embedding_service is not None:
+                return self.embedding_service.embed(code)[None, :]
+            return self.get_code_embeddings([code])
         except Exception as e:
             print(f"Error getting embedding: {e}")
             return None
     
+    def get_code_embeddings(self, codes):
+        """
+        Get embedding vectors for several snippets at once, one row per snippet
+        All their windows are sorted by length and run in padded micro-batches,
+        so each batch is padded only to its own longest window
+        """
+        if not self.loaded:
+            self.load_model()
+        if not self.loaded:
+            raise RuntimeError('CodeBERT model is not loaded')
+        import torch
+        
+        encoded = self.tokenizer(list(codes), truncation=True, max_length=512,
+                                 return_overflowing_tokens=True)
+        windows = encoded['input_ids']
+        owners = encoded['overflow_to_sample_mapping']
+        order = sorted(range(len(windows)), key=lambda i: len(windows[i]))
+        
+        sums = None
+        counts = torch.zeros(len(codes))
+        with torch.no_grad():
+            for start in range(0, len(order), self.micro_batch_size):
+                batch = order[start:start + self.micro_batch_size]
+                inputs = self.tokenizer.pad({'input_ids': [windows[i] for i in batch]}, return_tensors="pt")
+                hidden = self.encoder(inputs['input_ids'], inputs['attention_mask']).float()
+                if sums is None:
+                    sums = torch.zeros(len(codes), hidden.shape[-1])
+                # Sum over real tokens only; shorter windows are padded
+                mask = inputs['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                index = torch.tensor([owners[i] for i in batch])
+                sums.index_add_(0, index, (hidden * mask).sum(dim=1))
+                counts.index_add_(0, index, mask.sum(dim=(1, 2)))
+        
+        return (sums / counts.unsqueeze(-1)).numpy()
+    
     def analyze_code_quality(self, code, language):
         """Analyze code quality using ML model"""
         results = {
@@ -56,12 +210,13 @@ class CodeAnalyzerModel:
             'metrics': {}
         }
         
-        # Static analysis patterns
-        bugs = self._detect_bugs(code, language)
-        security_issues = self._detect_security_issues(code, language)
-        improvements = self._suggest_improvements(code, language)
-        best_practices = self._check_best_practices(code, language)
-        metrics = self._calculate_metrics(code, language)
+        # Static analysis - every rule for the language in a single pass
+        scan = self._scan(code, language)
+        bugs = scan.findings['bugs']
+        security_issues = scan.findings['security']
+        improvements = self._suggest_improvements(scan)
+        best_practices = scan.findings['best_practices']
+        metrics = self._calculate_metrics(scan)
         
         # Calculate overall quality score
         quality_score = self._calculate_quality_score(bugs, security_issues, metrics)
@@ -76,143 +231,22 @@ class CodeAnalyzerModel:
         
         return results
     
-    def _detect_bugs(self, code, language):
-        """Detect potential bugs using pattern matching"""
-        bugs = []
-        lines = code.split('\n')
-        
-        if language == 'python':
-            # Check for common Python bugs
-            for i, line in enumerate(lines, 1):
-                if '==' in line and 'if' in line and 'None' in line:
-                    bugs.append({
-                        'severity': 'medium',
-                        'line': str(i),
-                        'issue': 'Use "is None" instead of "== None"',
-                        'fix': 'Replace "== None" with "is None" for identity comparison'
-                    })
-                
-                if 'except:' in line and 'pass' in lines[min(i, len(lines)-1)]:
-                    bugs.append({
-                        'severity': 'high',
-                        'line': str(i),
-                        'issue': 'Bare except clause catches all exceptions',
-                        'fix': 'Specify exception types: except ValueError, TypeError:'
-                    })
-                
-                if re.search(r'range\(len\(', line):
-                    bugs.append({
-                        'severity': 'low',
-                        'line': str(i),
-                        'issue': 'Unnecessary use of range(len())',
-                        'fix': 'Use "for item in list:" or "for i, item in enumerate(list):"'
-                    })
-                
-                if 'print(' in line:
-                    bugs.append({
-                        'severity': 'low',
-                        'line': str(i),
-                        'issue': 'Print statement found',
-                        'fix': 'Use logging module or remove for production'
-                    })
-
-                if 'open(' in line and 'with' not in line:
-                     bugs.append({
-                        'severity': 'medium',
-                        'line': str(i),
-                        'issue': 'File opened without context manager',
-                        'fix': 'Use "with open(...) as f:" to ensure file closure'
-                    })
-        
-        elif language == 'javascript':
-            for i, line in enumerate(lines, 1):
-                if '==' in line and '!=' not in line:
-                    bugs.append({
-                        'severity': 'medium',
-                        'line': str(i),
-                        'issue': 'Use === instead of == for strict equality',
-                        'fix': 'Replace == with === to avoid type coercion'
-                    })
-                
-                if 'var ' in line:
-                    bugs.append({
-                        'severity': 'low',
-                        'line': str(i),
-                        'issue': 'Use let or const instead of var',
-                        'fix': 'Replace var with const (immutable) or let (mutable)'
-                    })
-                
-                if 'console.log(' in line:
-                     bugs.append({
-                        'severity': 'low',
-                        'line': str(i),
-                        'issue': 'Console log found',
-                        'fix': 'Remove console.log statements from production code'
-                    })
-        
-        return bugs
-    
-    def _detect_security_issues(self, code, language):
-        """Detect security vulnerabilities"""
-        security = []
-        lines = code.split('\n')
-        
-        if language == 'python':
-            for i, line in enumerate(lines, 1):
-                if 'eval(' in line:
-                    security.append({
-                        'risk': 'Code injection vulnerability with eval()',
-                        'severity': 'high',
-                        'mitigation': 'Avoid eval(). Use ast.literal_eval() for safe evaluation'
-                    })
-                
-                if 'pickle.load' in line:
-                    security.append({
-                        'risk': 'Pickle deserialization can execute arbitrary code',
-                        'severity': 'high',
-                        'mitigation': 'Use JSON or validate pickle sources carefully'
-                    })
-                
-                if re.search(r'password\s*=\s*["\']', line, re.IGNORECASE):
-                    security.append({
-                        'risk': 'Hardcoded password detected',
-                        'severity': 'high',
-                        'mitigation': 'Use environment variables or secure vaults'
-                    })
-
-                if 'subprocess.call' in line or 'subprocess.Popen' in line:
-                     if 'shell=True' in line:
-                        security.append({
-                            'risk': 'Shell injection risk with shell=True',
-                            'severity': 'high',
-                            'mitigation': 'Set shell=False (default) or sanitize input carefully'
-                        })
-        
-        elif language == 'javascript':
-            for i, line in enumerate(lines, 1):
-                if 'eval(' in line:
-                    security.append({
-                        'risk': 'eval() can execute malicious code',
-                        'severity': 'high',
-                        'mitigation': 'Avoid eval(). Use JSON.parse() or safer alternatives'
-                    })
-                
-                if 'innerHTML' in line and '+' in line:
-                    security.append({
-                        'risk': 'XSS vulnerability with innerHTML',
-                        'severity': 'high',
-                        'mitigation': 'Use textContent or sanitize input with DOMPurify'
-                    })
-        
-        return security
+    def _scan(self, code, language):
+        """Use the AST backend for Python if enabled, falling back to the rule engine"""
+        if language == 'python' and self.python_ast:
+            try:
+                return analyze_python(code)
+            except (SyntaxError, ValueError, RecursionError):
+                # Snippets and truncated files often do not parse
+                pass
+        return rule_engine.scan(code, language)
     
-    def _suggest_improvements(self, code, language):
+    def _suggest_improvements(self, scan):
         """Suggest code improvements"""
         improvements = []
-        lines = code.split('\n')
         
         # Check code length
-        if len(lines) > 50:
+        if scan.line_count > 50:
             improvements.append({
                 'category': 'maintainability',
                 'suggestion': 'Consider breaking down into smaller functions',
@@ -220,71 +254,34 @@ class CodeAnalyzerModel:
             })
         
         # Check for comments
-        comment_count = sum(1 for line in lines if line.strip().startswith('#') or line.strip().startswith('//'))
-        if comment_count < len(lines) * 0.1:
+        if scan.comment_lines < scan.line_count * 0.1:
             improvements.append({
                 'category': 'readability',
                 'suggestion': 'Add more comments to explain complex logic',
                 'example': '# Explain what this section does'
             })
         
-        # Check for magic numbers
-        if re.search(r'\b\d{2,}\b', code):
-            improvements.append({
-                'category': 'maintainability',
-                'suggestion': 'Replace magic numbers with named constants',
-                'example': 'MAX_RETRIES = 3 instead of hardcoded 3'
-            })
+        # Rule-based suggestions (e.g. magic numbers)
+        improvements.extend(scan.findings['improvements'])
         
         return improvements
     
-    def _check_best_practices(self, code, language):
-        """Check for best practices"""
-        practices = []
-        
-        if language == 'python':
-            if 'import *' in code:
-                practices.append({
-                    'practice': 'Avoid wildcard imports',
-                    'current': 'from module import *',
-                    'recommended': 'from module import specific_function'
-                })
-            
-            if not re.search(r'def \w+\(.*\):\s*"""', code):
-                practices.append({
-                    'practice': 'Add docstrings to functions',
-                    'current': 'Functions without documentation',
-                    'recommended': 'Add """docstring""" after function definition'
-                })
-        
-        elif language == 'javascript':
-            if 'function(' in code and '=>' not in code:
-                practices.append({
-                    'practice': 'Consider using arrow functions',
-                    'current': 'function(x) { return x * 2; }',
-                    'recommended': '(x) => x * 2'
-                })
-        
-        return practices
-    
-    def _calculate_metrics(self, code, language):
+    def _calculate_metrics(self, scan):
         """Calculate code metrics"""
-        lines = code.split('\n')
-        non_empty_lines = [l for l in lines if l.strip()]
-        
-        # Complexity (simplified cyclomatic complexity)
-        complexity_keywords = ['if', 'elif', 'else', 'for', 'while', 'try', 'except', 'case', 'switch']
-        complexity_count = sum(1 for line in lines for keyword in complexity_keywords if keyword in line)
+        # Complexity (real cyclomatic complexity of the worst function when
+        # the code parsed, otherwise a decision-keyword count)
         # Lower complexity is better, so invert the score
-        complexity_score = max(1, min(10, 10 - complexity_count // 2))
+        if scan.cyclomatic_complexity is not None:
+            complexity_score = max(1, min(10, 10 - scan.cyclomatic_complexity // 2))
+        else:
+            complexity_score = max(1, min(10, 10 - scan.complexity_count // 2))
         
         # Readability (based on line length and naming)
-        avg_line_length = sum(len(l) for l in non_empty_lines) / max(len(non_empty_lines), 1)
+        avg_line_length = scan.non_empty_chars / max(scan.non_empty_lines, 1)
         readability_score = max(1, min(10, int(10 - (avg_line_length - 40) / 10)))
         
         # Maintainability (based on function count and size)
-        function_count = len(re.findall(r'def |function ', code))
-        lines_per_function = len(non_empty_lines) / max(function_count, 1)
+        lines_per_function = scan.non_empty_lines / max(scan.function_count, 1)
         # Good maintainability: multiple small functions
         if lines_per_function < 20:
             maintainability_score = 9
@@ -294,11 +291,14 @@ class CodeAnalyzerModel:
             maintainability_score = 5
         maintainability_score = max(1, min(10, maintainability_score))
         
-        return {
+        metrics = {
             'complexity': f"{complexity_score}/10",
             'readability': f"{readability_score}/10",
             'maintainability': f"{maintainability_score}/10"
         }
+        if scan.cyclomatic_complexity is not None:
+            metrics['cyclomatic_complexity'] = scan.cyclomatic_complexity
+        return metrics
     
     def _calculate_quality_score(self, bugs, security, metrics):
         """Calculate overall quality score"""
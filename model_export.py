@@ -0,0 +1,231 @@
+"""
+Exports of the CodeBERT encoder for smaller, faster CPU inference
+The encoder is exported once, at build time or on first load, to TorchScript
+or ONNX with dynamic int8 quantization of its linear layers; workers then
+load that file instead of the fp32 weights. The fp32 weights can also be
+saved in a form that every worker memory-maps, so they share one copy
+Run: python model_export.py [--format torchscript|onnx|mapped] [--dir DIR] [--check]
+"""
+
+import argparse
+import itertools
+import os
+
+import numpy as np
+import torch
+
+# Export format -> file name in the export directory
+EXPORT_FILES = {
+    'torchscript': 'codebert-int8.pt',
+    'onnx': 'codebert-int8.onnx'
+}
+
+# fp32 weights for memory-mapping
+MAPPED_WEIGHTS_FILE = 'codebert-fp32.pt'
+
+# Lowest cosine similarity to the fp32 embedding an export may have
+PARITY_TOLERANCE = 0.99
+
+# Snippets used to trace the model and to check parity
+SAMPLE_SNIPPETS = [
+    "def add(a, b):\n    return a + b",
+    "for (let i = 0; i < items.length; i++) {\n  total += items[i].price * items[i].quantity;\n}",
+    "class Cache:\n    def __init__(self):\n        self.items = {}\n\n    def get(self, key, default=None):\n        return self.items.get(key, default)",
+    "SELECT id, name FROM users WHERE email = '" + "' + email + '" + "';",
+    "public static int fib(int n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }",
+    "import os\npassword = os.getenv('DB_PASSWORD')\nquery = f\"SELECT * FROM t WHERE id = {user_id}\"\n" * 20,
+]
+
+
+def export_path(directory, fmt):
+    """Where the export of a format lives"""
+    if fmt not in EXPORT_FILES:
+        raise ValueError(f'Unknown export format: {fmt}')
+    return os.path.join(directory, EXPORT_FILES[fmt])
+
+
+def export_encoder(model_name, fmt, directory):
+    """Quantize the encoder to int8 and write it in the given format; returns the file path"""
+    from transformers import AutoModel, AutoTokenizer
+
+    path = export_path(directory, fmt)
+    os.makedirs(directory, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # torchscript=True makes the model return plain tuples, which both exporters need
+    model = AutoModel.from_pretrained(model_name, torchscript=True)
+    model.eval()
+    sample = tokenizer(SAMPLE_SNIPPETS[:2], padding=True, return_tensors="pt")
+    inputs = (sample['input_ids'], sample['attention_mask'])
+    # Written under a temporary name, so workers never load a half-written file
+    temporary = f'{path}.{os.getpid()}.tmp'
+
+    if fmt == 'torchscript':
+        quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        with torch.no_grad():
+            traced = torch.jit.trace(quantized, inputs, strict=False)
+        torch.jit.save(traced, temporary)
+    else:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        fp32_path = f'{path}.{os.getpid()}.fp32'
+        axes = {0: 'batch', 1: 'sequence'}
+        with torch.no_grad():
+            torch.onnx.export(
+                model, inputs, fp32_path,
+                input_names=['input_ids', 'attention_mask'],
+                output_names=['last_hidden_state', 'pooler_output'],
+                dynamic_axes={'input_ids': axes, 'attention_mask': axes,
+                              'last_hidden_state': axes, 'pooler_output': {0: 'batch'}},
+                opset_version=14
+            )
+        try:
+            quantize_dynamic(fp32_path, temporary, weight_type=QuantType.QInt8)
+        finally:
+            os.remove(fp32_path)
+    os.replace(temporary, path)
+    return path
+
+
+class TorchEncoder:
+    """The fp32 transformers model"""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, input_ids, attention_mask):
+        return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+
+class TorchScriptEncoder:
+    """A quantized TorchScript export"""
+
+    def __init__(self, path, num_threads=None):
+        # TorchScript runs on torch's own intra-op thread pool
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self.module = torch.jit.load(path)
+        self.module.eval()
+
+    def __call__(self, input_ids, attention_mask):
+        return self.module(input_ids, attention_mask)[0]
+
+
+class OnnxEncoder:
+    """A quantized ONNX export, run by onnxruntime"""
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def __call__(self, input_ids, attention_mask):
+        hidden = self.session.run(['last_hidden_state'], {
+            'input_ids': input_ids.numpy(),
+            'attention_mask': attention_mask.numpy()
+        })[0]
+        return torch.from_numpy(hidden)
+
+
+EXPORT_ENCODERS = {
+    'torchscript': TorchScriptEncoder,
+    'onnx': OnnxEncoder
+}
+
+
+def load_encoder(model_name, fmt, directory, num_threads=None):
+    """Load the export of a format, exporting it first if it does not exist yet"""
+    path = export_path(directory, fmt)
+    if not os.path.exists(path):
+        print(f"Exporting CodeBERT to {path}...")
+        export_encoder(model_name, fmt, directory)
+    return EXPORT_ENCODERS[fmt](path, num_threads)
+
+
+def save_mapped_weights(model_name, directory):
+    """Write every parameter and buffer of the fp32 encoder to one file torch.load can memory-map"""
+    from transformers import AutoModel
+
+    path = os.path.join(directory, MAPPED_WEIGHTS_FILE)
+    os.makedirs(directory, exist_ok=True)
+    model = AutoModel.from_pretrained(model_name)
+    # Buffers too: non-persistent ones (position ids) are not in state_dict()
+    tensors = dict(itertools.chain(model.named_parameters(), model.named_buffers()))
+    temporary = f'{path}.{os.getpid()}.tmp'
+    torch.save({name: tensor.detach().contiguous() for name, tensor in tensors.items()}, temporary)
+    os.replace(temporary, path)
+    return path
+
+
+def load_mapped_model(model_name, directory):
+    """
+    The fp32 encoder with its weights memory-mapped read-only from the saved file
+    (saved first if it does not exist yet): every process that maps the file
+    shares the same page-cache pages instead of holding its own copy
+    """
+    from transformers import AutoConfig, AutoModel
+
+    path = os.path.join(directory, MAPPED_WEIGHTS_FILE)
+    if not os.path.exists(path):
+        print(f"Saving CodeBERT weights to {path}...")
+        save_mapped_weights(model_name, directory)
+    # Built on the meta device, so no memory is allocated for the weights it is about to replace
+    with torch.device('meta'):
+        model = AutoModel.from_config(AutoConfig.from_pretrained(model_name))
+    tensors = torch.load(path, mmap=True, weights_only=True)
+    for name, tensor in tensors.items():
+        module_name, _, attribute = name.rpartition('.')
+        module = model.get_submodule(module_name)
+        if attribute in module._parameters:
+            module._parameters[attribute] = torch.nn.Parameter(tensor, requires_grad=False)
+        else:
+            module._buffers[attribute] = tensor
+    if any(tensor.is_meta for tensor in itertools.chain(model.parameters(), model.buffers())):
+        raise ValueError(f'{path} does not hold every weight of {model_name}')
+    model.eval()
+    return model
+
+
+def check_parity(reference, candidate, snippets=SAMPLE_SNIPPETS, tolerance=PARITY_TOLERANCE):
+    """
+    Cosine similarity of every snippet's embedding under two CodeAnalyzerModels
+    Returns (lowest similarity, True if it is within tolerance)
+    """
+    expected = reference.get_code_embeddings(snippets)
+    actual = candidate.get_code_embeddings(snippets)
+    similarity = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1))
+    lowest = float(similarity.min())
+    return lowest, lowest >= tolerance
+
+
+def main():
+    from ml_model import CodeAnalyzerModel
+
+    parser = argparse.ArgumentParser(description='Export the CodeBERT encoder with int8 quantization')
+    parser.add_argument('--format', choices=sorted(EXPORT_FILES) + ['mapped'],
+                        default=os.getenv('EMBEDDING_BACKEND', 'torchscript'))
+    parser.add_argument('--dir', default=os.getenv('EMBEDDING_EXPORT_DIR', 'cache/models'))
+    parser.add_argument('--check', action='store_true', help='compare embeddings against the fp32 model')
+    args = parser.parse_args()
+
+    model_name = CodeAnalyzerModel().model_name
+    if args.format == 'mapped':
+        path = save_mapped_weights(model_name, args.dir)
+    else:
+        path = export_encoder(model_name, args.format, args.dir)
+    print(f"Exported {path} ({os.path.getsize(path) / 1024 / 1024:.0f} MB)")
+    if args.check:
+        reference = CodeAnalyzerModel()
+        if args.format == 'mapped':
+            candidate = CodeAnalyzerModel(export_dir=args.dir, mmap_weights=True)
+        else:
+            candidate = CodeAnalyzerModel(backend=args.format, export_dir=args.dir)
+        lowest, passed = check_parity(reference, candidate)
+        print(f"Lowest cosine similarity to fp32: {lowest:.4f} (tolerance {PARITY_TOLERANCE})")
+        if not passed:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
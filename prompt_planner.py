@@ -0,0 +1,265 @@
+"""
+Prompt planning for Gemini code reviews
+A plan picks the review sections to ask for, a compact or full schema by
+code size, an output token budget to match, and strips comments and
+trailing whitespace from the code, so small requests stay small
+"""
+
+from lexer import COMMENT, lexer_for
+
+# Every review section: (full schema entry, compact schema entry)
+REVIEW_SECTIONS = {
+    'overall_quality': (
+        '"overall_quality": "X/10"',
+        '"overall_quality": "X/10"'
+    ),
+    'summary': (
+        '"summary": "Detailed executive summary (4-5 sentences) with relevant emojis explaining the code\'s purpose, strengths, and key areas for improvement"',
+        '"summary": "2-3 sentence summary with relevant emojis"'
+    ),
+    'bugs': (
+        '"bugs": [\n'
+        '            {"issue": "Precise bug description with context", "line": "Line number or range", "severity": "Critical/High/Medium/Low", "fix": "Exact code fix with explanation", "impact": "What happens if not fixed"}\n'
+        '        ]',
+        '"bugs": [{"issue": "Bug", "line": "Line", "severity": "Critical/High/Medium/Low", "fix": "Short fix"}]'
+    ),
+    'security': (
+        '"security": [\n'
+        '            {"risk": "Specific vulnerability (include OWASP category if applicable)", "severity": "Critical/High/Medium/Low", "mitigation": "Concrete steps to fix with code examples", "cwe_id": "CWE number if applicable"}\n'
+        '        ]',
+        '"security": [{"risk": "Vulnerability", "severity": "Critical/High/Medium/Low", "mitigation": "Short fix", "cwe_id": "CWE if any"}]'
+    ),
+    'improvements': (
+        '"improvements": [\n'
+        '            {"category": "Performance/Security/Style/Logic/Maintainability", "suggestion": "Detailed suggestion with reasoning", "example": "Refactored code snippet", "priority": "High/Medium/Low", "effort": "Easy/Medium/Hard"}\n'
+        '        ]',
+        '"improvements": [{"category": "Performance/Security/Style/Logic/Maintainability", "suggestion": "Suggestion", "priority": "High/Medium/Low"}]'
+    ),
+    'best_practices': (
+        '"best_practices": [\n'
+        '            {"practice": "Industry standard or design pattern name", "current": "How it\'s currently implemented", "recommended": "The proper pattern with code example", "benefit": "Why this matters"}\n'
+        '        ]',
+        '"best_practices": [{"practice": "Practice", "recommended": "What to do", "benefit": "Why"}]'
+    ),
+    'complexity_analysis': (
+        '"complexity_analysis": {\n'
+        '             "time_complexity": "Precise Big O notation (e.g., O(n²)) with detailed explanation of why",\n'
+        '             "space_complexity": "Precise Big O notation with detailed explanation",\n'
+        '             "cyclomatic_complexity": "Estimated complexity score with reasoning",\n'
+        '             "cognitive_complexity": "How hard is this code to understand (1-10) with explanation"\n'
+        '        }',
+        '"complexity_analysis": {"time_complexity": "Big O and why", "space_complexity": "Big O", "cyclomatic_complexity": "Score", "cognitive_complexity": "1-10"}'
+    ),
+    'architecture_analysis': (
+        '"architecture_analysis": {\n'
+        '            "design_patterns": "List design patterns used or that should be used",\n'
+        '            "separation_of_concerns": "Rating (1-10) and explanation",\n'
+        '            "modularity": "Rating (1-10) and suggestions",\n'
+        '            "coupling": "Tight/Loose coupling assessment",\n'
+        '            "cohesion": "High/Low cohesion assessment"\n'
+        '        }',
+        '"architecture_analysis": {"design_patterns": "Patterns", "separation_of_concerns": "1-10", "modularity": "1-10", "coupling": "Tight/Loose", "cohesion": "High/Low"}'
+    ),
+    'code_smells': (
+        '"code_smells": [\n'
+        '            {"smell": "Name of code smell (e.g., Long Method, God Class)", "location": "Where it occurs", "refactoring": "How to fix it", "severity": "High/Medium/Low"}\n'
+        '        ]',
+        '"code_smells": [{"smell": "Smell", "location": "Where", "refactoring": "Fix", "severity": "High/Medium/Low"}]'
+    ),
+    'performance_optimization': (
+        '"performance_optimization": [\n'
+        '            {"issue": "Performance bottleneck description", "current_approach": "Current implementation", "optimized_approach": "Better approach with code", "expected_improvement": "Estimated performance gain"}\n'
+        '        ]',
+        '"performance_optimization": [{"issue": "Bottleneck", "optimized_approach": "Better approach", "expected_improvement": "Gain"}]'
+    ),
+    'error_handling': (
+        '"error_handling": {\n'
+        '            "rating": "X/10",\n'
+        '            "issues": ["List of error handling problems"],\n'
+        '            "recommendations": ["Specific improvements needed"]\n'
+        '        }',
+        '"error_handling": {"rating": "X/10", "issues": ["Problem"], "recommendations": ["Fix"]}'
+    ),
+    'documentation_quality': (
+        '"documentation_quality": {\n'
+        '            "rating": "X/10",\n'
+        '            "missing": ["What documentation is missing"],\n'
+        '            "suggestions": ["How to improve documentation"]\n'
+        '        }',
+        '"documentation_quality": {"rating": "X/10", "missing": ["Missing docs"], "suggestions": ["Suggestion"]}'
+    ),
+    'testing_recommendations': (
+        '"testing_recommendations": [\n'
+        '            {"test_type": "Unit/Integration/E2E", "scenario": "What to test", "example": "Sample test case structure", "priority": "High/Medium/Low"}\n'
+        '        ]',
+        '"testing_recommendations": [{"test_type": "Unit/Integration/E2E", "scenario": "What to test", "priority": "High/Medium/Low"}]'
+    ),
+    'dependency_analysis': (
+        '"dependency_analysis": {\n'
+        '            "external_dependencies": "Assessment of external dependencies",\n'
+        '            "recommendations": "Suggestions for dependency management",\n'
+        '            "security_concerns": "Any dependency-related security issues"\n'
+        '        }',
+        '"dependency_analysis": {"external_dependencies": "Assessment", "recommendations": "Suggestion", "security_concerns": "Concerns"}'
+    ),
+    'scalability_assessment': (
+        '"scalability_assessment": {\n'
+        '            "current_scalability": "Rating (1-10) with explanation",\n'
+        '            "bottlenecks": ["List of scalability bottlenecks"],\n'
+        '            "recommendations": ["How to improve scalability"]\n'
+        '        }',
+        '"scalability_assessment": {"current_scalability": "1-10", "bottlenecks": ["Bottleneck"], "recommendations": ["Suggestion"]}'
+    ),
+    'code_duplication': (
+        '"code_duplication": {\n'
+        '            "detected": "Yes/No",\n'
+        '            "instances": ["Where duplication occurs"],\n'
+        '            "refactoring_suggestion": "How to eliminate duplication"\n'
+        '        }',
+        '"code_duplication": {"detected": "Yes/No", "instances": ["Where"], "refactoring_suggestion": "Fix"}'
+    ),
+    'refactoring_opportunities': (
+        '"refactoring_opportunities": [\n'
+        '            {"area": "What needs refactoring", "reason": "Why it needs refactoring", "approach": "How to refactor", "benefit": "Expected outcome"}\n'
+        '        ]',
+        '"refactoring_opportunities": [{"area": "What", "approach": "How", "benefit": "Outcome"}]'
+    ),
+    'metrics': (
+        '"metrics": {\n'
+        '            "complexity": "X/10 (10 is simplest, 1 is most complex)",\n'
+        '            "readability": "X/10",\n'
+        '            "maintainability": "X/10",\n'
+        '            "testability": "X/10",\n'
+        '            "reusability": "X/10",\n'
+        '            "reliability": "X/10"\n'
+        '        }',
+        '"metrics": {"complexity": "X/10 (10 is simplest)", "readability": "X/10", "maintainability": "X/10", "testability": "X/10", "reusability": "X/10", "reliability": "X/10"}'
+    ),
+}
+
+ALL_SECTIONS = tuple(REVIEW_SECTIONS)
+
+# The UI needs these whatever else was asked for
+REQUIRED_SECTIONS = ('overall_quality', 'summary', 'metrics')
+
+# Output tokens Gemini needs per section, on top of a fixed allowance
+FULL_SECTION_TOKENS = 450
+COMPACT_SECTION_TOKENS = 120
+BASE_OUTPUT_TOKENS = 400
+
+COMPACT_NOTE = ("The code is short: keep every text field to one sentence, list at most 3 items per list, "
+                "and leave lists empty when there is nothing worth reporting.")
+COMMENTS_NOTE = ("Comments were removed from the code to save tokens; it had {count} comment lines. "
+                 "Judge documentation by that, docstrings and naming.")
+EXCERPT_NOTE = ("The code is one part of a larger file: do not report names defined elsewhere as missing, "
+                "and count line numbers from the first line of this part.")
+
+
+class PromptPlan:
+    """What one review asks for: sections, schema size, output budget and the code to send"""
+
+    def __init__(self, sections, compact, max_output_tokens, code, stripped_bytes, notes='', excerpt=False):
+        self.sections = sections
+        self.compact = compact
+        self.max_output_tokens = max_output_tokens
+        self.code = code
+        self.stripped_bytes = stripped_bytes
+        self.notes = notes
+        self.excerpt = excerpt
+
+    @property
+    def tag(self):
+        """Identifies the plan's output shape in cache keys ('' for a full review)"""
+        tag = '' if self.sections == ALL_SECTIONS else '+'.join(self.sections)
+        return tag + '@excerpt' if self.excerpt else tag
+
+    def summary(self):
+        """Plan facts worth logging with each request"""
+        return {
+            'sections': len(self.sections),
+            'compact': self.compact,
+            'max_output_tokens': self.max_output_tokens,
+            'stripped_bytes': self.stripped_bytes
+        }
+
+
+class PromptPlanner:
+    """Builds review plans and the schema text for them"""
+
+    def __init__(self, compact_max_lines=60, compact_max_bytes=2500, max_output_tokens=8000, strip_comments=True):
+        self.compact_max_lines = compact_max_lines
+        self.compact_max_bytes = compact_max_bytes
+        self.max_output_tokens = max_output_tokens
+        self.strip_comments = strip_comments
+
+    def parse_sections(self, value):
+        """
+        Turn a client's section filter (list or comma-separated string)
+        into a tuple in schema order; None or empty means every section.
+        Raises ValueError for unknown section names.
+        """
+        if not value:
+            return ALL_SECTIONS
+        if isinstance(value, str):
+            value = value.split(',')
+        if not isinstance(value, (list, tuple)):
+            raise ValueError('sections must be a list or a comma-separated string')
+        wanted = {str(name).strip() for name in value if str(name).strip()}
+        unknown = sorted(wanted - set(REVIEW_SECTIONS))
+        if unknown:
+            raise ValueError(f"Unknown review sections: {', '.join(unknown)}")
+        wanted.update(REQUIRED_SECTIONS)
+        return tuple(name for name in ALL_SECTIONS if name in wanted)
+
+    def plan(self, code, language, sections=ALL_SECTIONS, excerpt=False):
+        """Plan the review of one piece of code, or of one part of a larger input"""
+        notes = [EXCERPT_NOTE] if excerpt else []
+        lexer = lexer_for(language) if self.strip_comments else None
+        if lexer is not None:
+            prepared = compact_code(code, language)
+            if 'documentation_quality' in sections:
+                # The documentation review can no longer see the comments
+                notes.append(COMMENTS_NOTE.format(count=lexer.lex(code).comment_lines))
+        else:
+            prepared = strip_trailing_whitespace(code)
+        compact = (prepared.count('\n') + 1 <= self.compact_max_lines
+                   and len(prepared) <= self.compact_max_bytes)
+        if compact:
+            notes.append(COMPACT_NOTE)
+        per_section = COMPACT_SECTION_TOKENS if compact else FULL_SECTION_TOKENS
+        max_output_tokens = min(BASE_OUTPUT_TOKENS + per_section * len(sections), self.max_output_tokens)
+        return PromptPlan(sections, compact, max_output_tokens, prepared, len(code) - len(prepared),
+                          ' '.join(notes), excerpt)
+
+    def schema(self, sections=ALL_SECTIONS, compact=False):
+        """JSON structure text asking for the given sections"""
+        entries = [REVIEW_SECTIONS[name][1 if compact else 0] for name in sections]
+        if compact:
+            return '{\n        ' + ',\n        '.join(entries) + '\n    }'
+        return '{\n        ' + ',\n        \n        '.join(entries) + '\n    }'
+
+
+def strip_trailing_whitespace(code):
+    """Drop trailing whitespace from every line"""
+    return '\n'.join(line.rstrip() for line in code.split('\n')).rstrip('\n')
+
+
+def compact_code(code, language):
+    """
+    Remove comments and trailing whitespace from code. Comments are
+    replaced by the line breaks they contained, so line numbers in the
+    review still match the code the client sent.
+    """
+    lexer = lexer_for(language)
+    if lexer is None:
+        return strip_trailing_whitespace(code)
+    parts = []
+    last = 0
+    for kind, start, end in lexer.iter_spans(code):
+        if kind != COMMENT:
+            continue
+        parts.append(code[last:start])
+        parts.append('\n' * code.count('\n', start, end))
+        last = end
+    parts.append(code[last:])
+    return strip_trailing_whitespace(''.join(parts))
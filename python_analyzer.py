@@ -0,0 +1,263 @@
+"""
+AST-based analysis backend for Python code
+One ast.parse plus a single NodeVisitor traversal replaces the line-substring
+heuristics with exact positions and real cyclomatic complexity
+Parsing alone costs more than the whole string scan, so it is opt-in
+(PYTHON_AST_ANALYSIS, see ml_model.CodeAnalyzerModel._scan)
+"""
+
+import ast
+
+from rule_engine import ScanResult, rule_engine
+
+# Calls to these subprocess functions are checked for shell=True
+SUBPROCESS_FUNCTIONS = {'call', 'run', 'Popen', 'check_call', 'check_output'}
+
+# Smallest absolute value reported as a magic number (two or more digits)
+MAGIC_NUMBER_MIN = 10
+
+# Finding texts come from the rule packs so both backends report the same issues
+PYTHON_RULES = {rule.id: rule for rule in rule_engine.rule_set('python').rules}
+
+# Per node type, the fields generic_visit descends into
+_CHILD_FIELDS = {}
+
+
+class PythonAnalyzer(ast.NodeVisitor):
+    """Collect Python findings and metrics in a single AST traversal"""
+
+    def __init__(self):
+        self.rules = PYTHON_RULES
+        self.result = None
+        self._visitors = {}
+        self._managed_calls = set()
+        self._function_stack = []
+        self._module_complexity = 1
+        self._documented_functions = 0
+        self._document_hits = set()
+
+    def analyze(self, code):
+        """Parse and analyze code; raises SyntaxError if it is not valid Python"""
+        tree = ast.parse(code)
+
+        self.result = ScanResult()
+        self._managed_calls = set()
+        self._function_stack = []
+        self._module_complexity = 1
+        self._documented_functions = 0
+        self._document_hits = set()
+        self.visit(tree)
+
+        # Like the rule pack, only flag code where no function is documented
+        if not self._documented_functions:
+            self._document_hits.add('py-missing-docstrings')
+
+        for rule_id in ('py-wildcard-import', 'py-missing-docstrings', 'magic-number'):
+            if rule_id in self._document_hits:
+                rule = self.rules[rule_id]
+                self.result.findings[rule.category].append(dict(rule.finding))
+
+        self._count_lines(code)
+        # Top-level statements form their own scope (scripts may have no functions)
+        functions = self.result.functions
+        self.result.cyclomatic_complexity = max(
+            [self._module_complexity] + [f['complexity'] for f in functions]
+        )
+        return self.result
+
+
+    def visit(self, node):
+        # NodeVisitor.visit builds the method name for every node; cache it per type
+        visitor = self._visitors.get(node.__class__)
+        if visitor is None:
+            name = 'visit_' + node.__class__.__name__
+            visitor = self._visitors[node.__class__] = getattr(self, name, self.generic_visit)
+        visitor(node)
+
+    def generic_visit(self, node):
+        visit = self.visit
+        for field in _child_fields(node.__class__):
+            value = getattr(node, field, None)
+            if value.__class__ is list:
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        visit(item)
+            elif isinstance(value, ast.AST):
+                visit(value)
+
+    def visit_Name(self, node):
+        # Leaf for analysis purposes: only an identifier and its load/store context
+        pass
+
+    def _count_lines(self, code):
+        # Comments and blank lines are not part of the AST
+        result = self.result
+        for line in code.split('\n'):
+            stripped = line.strip()
+            if not stripped:
+                continue
+            result.non_empty_lines += 1
+            result.non_empty_chars += len(line)
+            if stripped[0] == '#':
+                result.comment_lines += 1
+        result.line_count = code.count('\n') + 1
+
+    def _report(self, rule_id, node):
+        rule = self.rules[rule_id]
+        finding = dict(rule.finding)
+        finding['line'] = str(node.lineno)
+        finding['column'] = str(node.col_offset + 1)
+        self.result.findings[rule.category].append(finding)
+
+    def _decision(self, points=1):
+        self.result.complexity_count += points
+        if self._function_stack:
+            self._function_stack[-1]['complexity'] += points
+        else:
+            self._module_complexity += points
+
+    # ---- Functions ----
+
+    def visit_FunctionDef(self, node):
+        self.result.function_count += 1
+        if ast.get_docstring(node, clean=False) is not None:
+            self._documented_functions += 1
+
+        function = {'name': node.name, 'line': node.lineno, 'complexity': 1}
+        self._function_stack.append(function)
+        self.generic_visit(node)
+        self._function_stack.pop()
+        self.result.functions.append(function)
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    # ---- Decision points ----
+
+    def visit_If(self, node):
+        self._decision()
+        self.generic_visit(node)
+
+    visit_IfExp = visit_If
+    visit_For = visit_If
+    visit_AsyncFor = visit_If
+    visit_While = visit_If
+    visit_Assert = visit_If
+    visit_match_case = visit_If
+
+    def visit_BoolOp(self, node):
+        self._decision(len(node.values) - 1)
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        self._decision(1 + len(node.ifs))
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        self._decision()
+        if node.type is None:
+            self._report('py-bare-except', node)
+        self.generic_visit(node)
+
+    # ---- Bugs and security ----
+
+    def visit_Compare(self, node):
+        for op, comparator in zip(node.ops, node.comparators):
+            if isinstance(op, (ast.Eq, ast.NotEq)) and _is_none(comparator):
+                self._report('py-none-comparison', node)
+                break
+        self.generic_visit(node)
+
+    def visit_With(self, node):
+        for item in node.items:
+            self._managed_calls.add(id(item.context_expr))
+        self.generic_visit(node)
+
+    visit_AsyncWith = visit_With
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Name):
+            name = func.id
+            if name == 'print':
+                self._report('py-print', node)
+            elif name == 'eval':
+                self._report('py-eval', node)
+            elif name == 'open' and id(node) not in self._managed_calls:
+                self._report('py-open-without-with', node)
+            elif name == 'range' and node.args and _is_call_to(node.args[0], 'len'):
+                self._report('py-range-len', node)
+        elif isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name):
+            module = func.value.id
+            if module == 'pickle' and func.attr in ('load', 'loads'):
+                self._report('py-pickle-load', node)
+            elif module == 'subprocess' and func.attr in SUBPROCESS_FUNCTIONS:
+                for keyword in node.keywords:
+                    if keyword.arg == 'shell' and _is_true(keyword.value):
+                        self._report('py-shell-true', node)
+        for keyword in node.keywords:
+            if keyword.arg and _is_password(keyword.arg) and _is_string(keyword.value):
+                self._report('py-hardcoded-password', keyword.value)
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        if _is_string(node.value):
+            for target in node.targets:
+                if _is_password(_target_name(target)):
+                    self._report('py-hardcoded-password', node)
+                    break
+        self.generic_visit(node)
+
+    def visit_AnnAssign(self, node):
+        if node.value is not None and _is_string(node.value) and _is_password(_target_name(node.target)):
+            self._report('py-hardcoded-password', node)
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        if any(alias.name == '*' for alias in node.names):
+            self._document_hits.add('py-wildcard-import')
+
+    def visit_Constant(self, node):
+        value = node.value
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and abs(value) >= MAGIC_NUMBER_MIN:
+            self._document_hits.add('magic-number')
+
+
+def analyze_python(code):
+    """Analyze Python code with a fresh visitor (safe across request threads)"""
+    return PythonAnalyzer().analyze(code)
+
+
+def _child_fields(node_type):
+    """Fields of a node type that can hold child nodes (the load/store context never does)"""
+    fields = _CHILD_FIELDS.get(node_type)
+    if fields is None:
+        fields = _CHILD_FIELDS[node_type] = tuple(f for f in node_type._fields if f != 'ctx')
+    return fields
+
+
+def _is_none(node):
+    return isinstance(node, ast.Constant) and node.value is None
+
+
+def _is_true(node):
+    return isinstance(node, ast.Constant) and node.value is True
+
+
+def _is_string(node):
+    return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+
+def _is_call_to(node, name):
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name
+
+
+def _is_password(name):
+    return name is not None and 'password' in name.lower()
+
+
+def _target_name(node):
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
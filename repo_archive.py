@@ -0,0 +1,86 @@
+"""
+Repository download through a single archive request
+The tarball is read as a stream and matching files are decoded as they go
+by, so nothing is extracted to disk and there is one round trip per repo
+"""
+
+import tarfile
+
+import requests
+
+
+class ArchiveError(Exception):
+    """The archive could not be downloaded or read"""
+    pass
+
+
+class _LimitedReader:
+    """File-like wrapper that refuses to read past a byte budget"""
+
+    def __init__(self, raw, max_bytes):
+        self.raw = raw
+        self.max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        if self.bytes_read > self.max_bytes:
+            raise ArchiveError(f'Archive is larger than {self.max_bytes} bytes')
+        return data
+
+
+def iter_archive_files(fileobj, extensions, max_file_bytes):
+    """
+    Yield (path, size, text) for every regular file in a gzipped tarball
+    stream whose extension matches and whose size is within max_file_bytes.
+    Non-matching files yield text None so callers can still count them.
+    The top-level "<owner>-<repo>-<sha>/" directory is stripped from paths.
+    """
+    extensions = tuple(extensions)
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                path = member.name.split('/', 1)[1] if '/' in member.name else member.name
+                if not path.endswith(extensions):
+                    continue
+                if member.size > max_file_bytes:
+                    yield path, member.size, None
+                    continue
+                data = archive.extractfile(member).read()
+                yield path, member.size, data.decode('utf-8', errors='ignore')
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f'Could not read repository archive: {e}')
+
+
+def download_archive_files(api_url, owner, repo, ref, headers, extensions,
+                           max_file_bytes, max_files, max_archive_bytes, session=requests, timeout=30,
+                           paths=None):
+    """
+    Download a repository tarball once and keep up to max_files matching files
+
+    Returns (files, total_matching): files is a list of
+    {'path', 'size', 'type', 'content'} in archive order, total_matching
+    counts every file with a matching extension. If `paths` is given only
+    those files are kept.
+    """
+    url = f'{api_url}/repos/{owner}/{repo}/tarball/{ref}'
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise ArchiveError(f'GitHub returned status {response.status_code} for the archive')
+        response.raw.decode_content = True
+        reader = _LimitedReader(response.raw, max_archive_bytes)
+
+        files = []
+        total_matching = 0
+        for path, size, text in iter_archive_files(reader, extensions, max_file_bytes):
+            total_matching += 1
+            if paths is not None and path not in paths:
+                continue
+            if text is not None and len(files) < max_files:
+                files.append({'path': path, 'size': size, 'type': 'blob', 'content': text})
+                if paths is not None and len(files) == len(paths):
+                    break  # Everything wanted is in; skip the rest of the download
+        return files, total_matching
@@ -0,0 +1,152 @@
+"""
+Per-repository analysis index keyed by git blob SHA
+A blob SHA changes exactly when a file's content does, so files whose SHA
+is already indexed can skip fetching and analysis on the next run
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blob_results (
+    repo TEXT NOT NULL,
+    version TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    language TEXT NOT NULL,
+    ml_result BLOB NOT NULL,
+    ai_result BLOB,
+    updated REAL NOT NULL,
+    PRIMARY KEY (repo, version, sha, language)
+);
+CREATE INDEX IF NOT EXISTS blob_results_updated ON blob_results (updated);
+"""
+
+
+class RepoIndex:
+    """SQLite store of analysis results per (repository, blob SHA, language)"""
+
+    def __init__(self, path, max_age=30 * 86400):
+        self.path = path
+        self.max_age = max_age
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {
+            'reused': 0,
+            'recomputed': 0,
+            'errors': 0
+        }
+
+    def lookup(self, repo, version, blobs):
+        """
+        Return {(sha, language): {'ml_result', 'ai_result'}} for the
+        (sha, language) pairs in `blobs` that are indexed
+        """
+        blobs = [(sha, language) for sha, language in blobs if sha]
+        if not self.path or not blobs:
+            return {}
+        found = {}
+        shas = sorted({sha for sha, _ in blobs})
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(shas), 500):
+            chunk = shas[start:start + 500]
+            rows = self._execute(
+                f"SELECT sha, language, ml_result, ai_result FROM blob_results "
+                f"WHERE repo = ? AND version = ? AND sha IN ({','.join('?' * len(chunk))})",
+                [repo, version] + chunk
+            ) or []
+            for sha, language, ml_result, ai_result in rows:
+                found[(sha, language)] = {
+                    'ml_result': json.loads(ml_result),
+                    'ai_result': json.loads(ai_result) if ai_result is not None else None
+                }
+        wanted = set(blobs)
+        return {key: value for key, value in found.items() if key in wanted}
+
+    def store(self, repo, version, entries):
+        """Record (sha, language, ml_result, ai_result) tuples for a repository"""
+        if not self.path:
+            return
+        now = time.time()
+        rows = [
+            (repo, version, sha, language, _dump(ml_result),
+             _dump(ai_result) if ai_result is not None else None, now)
+            for sha, language, ml_result, ai_result in entries if sha
+        ]
+        if rows:
+            self._execute_many(
+                'INSERT OR REPLACE INTO blob_results '
+                '(repo, version, sha, language, ml_result, ai_result, updated) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+        # Blobs not seen for max_age, and results of older analyzer versions
+        # that are never looked up again, age out here
+        self._execute('DELETE FROM blob_results WHERE updated < ?', (now - self.max_age,))
+
+    def touch(self, repo, version, shas):
+        """Mark reused blobs as recently seen so they do not age out"""
+        shas = sorted(set(sha for sha in shas if sha))
+        if not self.path or not shas:
+            return
+        now = time.time()
+        self._execute_many(
+            'UPDATE blob_results SET updated = ? WHERE repo = ? AND version = ? AND sha = ?',
+            [(now, repo, version, sha) for sha in shas]
+        )
+
+    def count(self, reused, recomputed):
+        """Add one run's reuse figures to the process counters"""
+        with self._lock:
+            self._stats['reused'] += reused
+            self._stats['recomputed'] += recomputed
+
+    def stats(self):
+        """Reuse counters for this process"""
+        with self._lock:
+            return dict(self._stats)
+
+    # ---- SQLite ----
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, sql, params=()):
+        try:
+            conn = self._connection()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self._error(e)
+            return None
+
+    def _execute_many(self, sql, rows):
+        try:
+            conn = self._connection()
+            with conn:
+                conn.executemany(sql, rows)
+        except sqlite3.Error as e:
+            self._error(e)
+
+    def _error(self, e):
+        print(f"Repository index error: {e}")
+        with self._lock:
+            self._stats['errors'] += 1
+
+
+def _dump(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
@@ -0,0 +1,252 @@
+"""
+Concurrent fetch-and-analyze pipeline for repository analysis
+Files are fetched and statically analyzed by one bounded pool and reviewed
+by Gemini in another; a cap on files in flight provides backpressure and a
+wall-clock budget bounds the whole run
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# AI column for files whose review did not finish inside the time budget
+AI_SKIPPED = {'error': 'AI analysis skipped - repository time budget exhausted'}
+
+# How long the submitter waits for a free slot before sending a partial batch
+BATCH_FLUSH_INTERVAL = 0.25
+
+
+class RepoPipeline:
+    """Run fetch -> ML analysis -> AI review over many files concurrently"""
+
+    def __init__(self, fetch_workers=8, ai_workers=4, max_in_flight=16, time_budget=60, logger=None,
+                 batch_budget=0, batch_files=1):
+        self.fetch_workers = fetch_workers
+        self.ai_workers = ai_workers
+        self.max_in_flight = max_in_flight
+        self.time_budget = time_budget
+        self.logger = logger
+        self.batch_budget = batch_budget
+        # Files waiting for a batch hold slots, so a batch must fit in them
+        self.batch_files = max(1, min(batch_files, max_in_flight))
+
+    def run(self, items, fetch, analyze, review=None, progress=None, review_batch=None, batch_cost=None):
+        """
+        Process items in order of submission and return (records, stats)
+
+        fetch(item) returns the file content or None, analyze(item, content)
+        the ML result and review(item, content) the AI result. Each record is
+        {'item', 'ml_result', 'ai_result'}; files that could not be fetched
+        or were not reached inside the budget are left out. progress(stats)
+        is called with a snapshot of the counters as files complete.
+
+        With review_batch, files for which batch_cost(content) is not None
+        are collected until their costs reach batch_budget (or batch_files
+        files) and reviewed together: review_batch([(item, content), ...])
+        returns one AI result per file. Other files use review.
+        """
+        run = _Run(self, items, fetch, analyze, review, progress, review_batch, batch_cost)
+        return run.execute()
+
+
+class _Run:
+    """State of one pipeline run"""
+
+    def __init__(self, pipeline, items, fetch, analyze, review, progress, review_batch, batch_cost):
+        self.pipeline = pipeline
+        self.items = items
+        self.fetch = fetch
+        self.analyze = analyze
+        self.review = review
+        self.progress = progress
+        self.review_batch = review_batch if pipeline.batch_budget > 0 else None
+        self.batch_cost = batch_cost
+        self.pending = []
+        self.pending_cost = 0
+        self.started = time.monotonic()
+        self.deadline = self.started + pipeline.time_budget
+        self.records = [None] * len(items)
+        self.ai_futures = {}
+        self.lock = threading.Lock()
+        # Backpressure: a file holds a slot from fetch until its review is done
+        self.slots = threading.BoundedSemaphore(pipeline.max_in_flight)
+        self.fetch_pool = ThreadPoolExecutor(max_workers=pipeline.fetch_workers, thread_name_prefix='repo-fetch')
+        self.ai_pool = ThreadPoolExecutor(max_workers=pipeline.ai_workers, thread_name_prefix='repo-ai')
+        self.stats = {
+            'files_considered': len(items),
+            'submitted': 0,
+            'fetched': 0,
+            'fetch_failed': 0,
+            'ai_reviewed': 0,
+            'ai_skipped': 0,
+            'ai_batches': 0
+        }
+
+    def execute(self):
+        fetch_futures = []
+        try:
+            for index, item in enumerate(self.items):
+                if not self._acquire_slot():
+                    break
+                fetch_futures.append(self.fetch_pool.submit(self._process, index, item))
+                self.stats['submitted'] += 1
+
+            wait(fetch_futures, timeout=max(0, self.deadline - time.monotonic()))
+            self._flush()
+            with self.lock:
+                ai_futures = dict(self.ai_futures)
+            wait(list(ai_futures.values()), timeout=max(0, self.deadline - time.monotonic()))
+        finally:
+            # Work still running is abandoned; Gemini results it produces
+            # still land in the result cache for the next run
+            self.fetch_pool.shutdown(wait=False, cancel_futures=True)
+            self.ai_pool.shutdown(wait=False, cancel_futures=True)
+
+        results = []
+        with self.lock:
+            for index, record in enumerate(self.records):
+                if record is None:
+                    continue
+                # Reviews still running or cancelled when the budget ran out
+                if self.review is not None and record['ai_result'] is None:
+                    record = dict(record, ai_result=dict(AI_SKIPPED))
+                    self.stats['ai_skipped'] += 1
+                results.append(dict(record))
+            self.stats['analyzed'] = len(results)
+        self.stats['elapsed'] = round(time.monotonic() - self.started, 3)
+        return results, dict(self.stats)
+
+    def _process(self, index, item):
+        handed_off = False
+        try:
+            if time.monotonic() >= self.deadline:
+                return
+            content = self.fetch(item)
+            if content is None:
+                self._count('fetch_failed')
+                self._report()
+                return
+            self._count('fetched')
+            ml_result = self.analyze(item, content)
+            with self.lock:
+                self.records[index] = {'item': item, 'ml_result': ml_result, 'ai_result': None}
+            self._report()
+            if self.review is None:
+                return
+            cost = self.batch_cost(content) if self.review_batch is not None else None
+            if cost is not None:
+                self._add_to_batch(index, item, content, cost)
+                handed_off = True
+                return
+            future = self.ai_pool.submit(self._review, index, item, content)
+            future.add_done_callback(lambda _: self.slots.release())
+            with self.lock:
+                self.ai_futures[index] = future
+            handed_off = True
+        except RuntimeError:
+            # The AI pool was shut down because the budget ran out
+            pass
+        except Exception as e:
+            self._count('fetch_failed')
+            self._log(f"Error analyzing {item.get('path', item)}: {e}")
+        finally:
+            if not handed_off:
+                self.slots.release()
+
+    def _review(self, index, item, content):
+        try:
+            ai_result = self.review(item, content)
+        except Exception as e:
+            self._log(f"AI analysis failed for {item.get('path', item)}: {e}")
+            ai_result = {'error': 'AI analysis unavailable'}
+        with self.lock:
+            self.records[index]['ai_result'] = ai_result
+            self.stats['ai_reviewed'] += 1
+        self._report()
+
+    def _acquire_slot(self):
+        """Wait for a free slot; False once the budget has run out"""
+        while True:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self.review_batch is None:
+                if not self.slots.acquire(timeout=remaining):
+                    return False
+            elif not self.slots.acquire(timeout=min(remaining, BATCH_FLUSH_INTERVAL)):
+                # Files waiting for a batch hold slots; send what is there
+                # rather than wait for a batch that cannot fill
+                self._flush()
+                continue
+            if time.monotonic() >= self.deadline:
+                self.slots.release()
+                return False
+            return True
+
+    def _add_to_batch(self, index, item, content, cost):
+        ready = []
+        with self.lock:
+            if self.pending and self.pending_cost + cost > self.pipeline.batch_budget:
+                ready.append(self._take_pending())
+            self.pending.append((index, item, content))
+            self.pending_cost += cost
+            if len(self.pending) >= self.pipeline.batch_files:
+                ready.append(self._take_pending())
+        for batch in ready:
+            self._submit_batch(batch)
+
+    def _take_pending(self):
+        batch, self.pending, self.pending_cost = self.pending, [], 0
+        return batch
+
+    def _flush(self):
+        with self.lock:
+            batch = self._take_pending()
+        if batch:
+            self._submit_batch(batch)
+
+    def _submit_batch(self, batch):
+        try:
+            future = self.ai_pool.submit(self._review_many, batch)
+        except RuntimeError:
+            # The AI pool was shut down because the budget ran out
+            for _ in batch:
+                self.slots.release()
+            return
+        future.add_done_callback(lambda _: [self.slots.release() for _ in batch])
+        with self.lock:
+            for index, _, _ in batch:
+                self.ai_futures[index] = future
+            self.stats['ai_batches'] += 1
+
+    def _review_many(self, batch):
+        try:
+            ai_results = self.review_batch([(item, content) for _, item, content in batch])
+        except Exception as e:
+            self._log(f"Batched AI analysis failed for {len(batch)} files: {e}")
+            ai_results = [{'error': 'AI analysis unavailable'} for _ in batch]
+        with self.lock:
+            for (index, _, _), ai_result in zip(batch, ai_results):
+                self.records[index]['ai_result'] = ai_result
+                self.stats['ai_reviewed'] += 1
+        self._report()
+
+    def _count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def _report(self):
+        if self.progress is None:
+            return
+        with self.lock:
+            snapshot = dict(self.stats)
+        try:
+            self.progress(snapshot)
+        except Exception as e:
+            self._log(f"Progress callback failed: {e}")
+
+    def _log(self, message):
+        if self.pipeline.logger is not None:
+            self.pipeline.logger.warning(message)
+        else:
+            print(message)
@@ -0,0 +1,224 @@
+"""
+Content-addressed store for analysis results
+A per-process LRU in memory in front of a SQLite file that every worker
+shares, so results survive restarts and are computed once per deployment
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE INDEX IF NOT EXISTS results_expires ON results (expires);
+-- Running total of results.size, kept by triggers so no write has to scan the table
+CREATE TABLE IF NOT EXISTS results_size (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    bytes INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS results_size_insert AFTER INSERT ON results BEGIN
+    UPDATE results_size SET bytes = bytes + new.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS results_size_delete AFTER DELETE ON results BEGIN
+    UPDATE results_size SET bytes = bytes - old.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS results_size_update AFTER UPDATE OF size ON results BEGIN
+    UPDATE results_size SET bytes = bytes - old.size + new.size WHERE id = 1;
+END;
+-- Seeded once, for files created before the total existed
+INSERT OR IGNORE INTO results_size (id, bytes)
+    SELECT 1, COALESCE(SUM(size), 0) FROM results WHERE NOT EXISTS (SELECT 1 FROM results_size);
+"""
+
+# Rows read at a time when evicting least recently used entries
+EVICTION_PAGE = 256
+
+
+def normalize_code(code):
+    """Canonical form of code for hashing: LF line endings, no trailing whitespace"""
+    lines = code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def content_key(code, language, version):
+    """BLAKE2 digest of normalized code, language and analyzer version"""
+    digest = hashlib.blake2b(digest_size=20)
+    for part in (version, language, normalize_code(code)):
+        digest.update(part.encode('utf-8', 'surrogatepass'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Two-tier result cache: memory LRU backed by a shared SQLite file"""
+
+    def __init__(self, path, memory_items=256, max_bytes=100 * 1024 * 1024, timeout=3600):
+        self.path = path
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._disk_enabled = bool(path)
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'sets': 0,
+            'evictions': 0,
+            'errors': 0
+        }
+
+    # ---- Public API ----
+
+    def get(self, key):
+        """Return a cached result or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+
+        entry = self._disk_get(key, now)
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+        expires, value = entry
+        self._remember(key, value, expires)
+        return value
+
+    def set(self, key, value, timeout=None, persist=True):
+        """Store a JSON-serializable result (persist=False keeps it in memory only)"""
+        expires = time.time() + (timeout if timeout is not None else self.timeout)
+        self._remember(key, value, expires)
+        with self._lock:
+            self._stats['sets'] += 1
+        if persist:
+            self._disk_set(key, value, expires)
+
+    def stats(self):
+        """Hit/miss counters for this process plus the shared disk tier size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_items'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        stats['disk_bytes'] = self._disk_size()
+        return stats
+
+    # ---- Memory tier ----
+
+    def _remember(self, key, value, expires):
+        with self._lock:
+            self._memory[key] = (expires, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    # ---- Disk tier ----
+
+    def _connection(self):
+        # sqlite3 connections must not cross threads or forked workers
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.executescript(SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _disk_execute(self, sql, params=()):
+        if not self._disk_enabled:
+            return None
+        try:
+            conn = self._connection()
+            with conn:
+                return conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Result cache disk error: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            return None
+
+    def _disk_get(self, key, now):
+        rows = self._disk_execute('SELECT value, expires FROM results WHERE key = ?', (key,))
+        if not rows:
+            return None
+        value, expires = rows[0]
+        if expires <= now:
+            self._disk_execute('DELETE FROM results WHERE key = ?', (key,))
+            return None
+        self._disk_execute('UPDATE results SET accessed = ? WHERE key = ?', (now, key))
+        return expires, json.loads(value)
+
+    def _disk_set(self, key, value, expires):
+        blob = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        # An upsert rather than INSERT OR REPLACE: the rows REPLACE deletes
+        # do not fire the delete trigger that keeps the size total
+        self._disk_execute(
+            'INSERT INTO results (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size, '
+            'expires = excluded.expires, accessed = excluded.accessed',
+            (key, blob, len(blob), expires, now)
+        )
+        self._evict(now)
+
+    def _evict(self, now):
+        # Expired entries go first, then least recently used until under budget
+        self._disk_execute('DELETE FROM results WHERE expires <= ?', (now,))
+        total = self._disk_size()
+        if total <= self.max_bytes:
+            return
+        victims = []
+        while total > self.max_bytes:
+            rows = self._disk_execute('SELECT key, size FROM results ORDER BY accessed LIMIT ? OFFSET ?',
+                                      (EVICTION_PAGE, len(victims))) or []
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                victims.append((key,))
+                total -= size
+        if victims and self._disk_enabled:
+            try:
+                conn = self._connection()
+                with conn:
+                    conn.executemany('DELETE FROM results WHERE key = ?', victims)
+            except sqlite3.Error as e:
+                print(f"Result cache disk error: {e}")
+                return
+            with self._lock:
+                self._stats['evictions'] += len(victims)
+
+    def _disk_size(self):
+        rows = self._disk_execute('SELECT bytes FROM results_size WHERE id = 1')
+        return rows[0][0] if rows else 0
@@ -0,0 +1,422 @@
+"""
+Single-pass rule engine for static code analysis
+Compiles every rule for a language into one combined matcher so bugs,
+security issues, best practices and metric counters come out of one walk
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from lexer import lexer_for
+
+# Keywords counted for the simplified cyclomatic complexity score
+COMPLEXITY_KEYWORDS = ['if', 'elif', 'else', 'for', 'while', 'try', 'except', 'case', 'switch']
+
+# Markers that start a comment line and introduce a function
+COMMENT_MARKERS = ['#', '//']
+FUNCTION_MARKERS = ['def ', 'function ']
+
+# A line holding nothing but whitespace (the leading newline belongs to the previous line)
+BLANK_LINE_PATTERN = r'\n[^\S\n]*(?=\n)'
+
+CATEGORIES = ['bugs', 'security', 'improvements', 'best_practices']
+
+# Metric counters a token can feed
+KEYWORD = 'keyword'
+COMMENT = 'comment'
+FUNCTION = 'function'
+BLANK = 'blank'
+
+# Rule packs: one JSON file per language plus common.json for every language.
+# A rule triggers on a substring (optionally a whole "word") or a regex;
+# line rules can additionally require/exclude text on the same line,
+# document rules fire once when their trigger was (or, with "absent", was
+# never) seen. A line-rule regex may be a list of alternatives: the combined
+# matcher stays on sre's fast scan only while every alternative starts with
+# a literal character.
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+COMMON_PACK = 'common'
+
+
+def load_rule_packs(directory=RULES_DIR):
+    """Load every rule pack in a directory, keyed by language"""
+    packs = {}
+    for filename in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(filename)
+        if ext != '.json':
+            continue
+        with open(os.path.join(directory, filename), encoding='utf-8') as f:
+            pack = json.load(f)
+        packs[name] = {
+            'extends': pack.get('extends', []),
+            'rules': pack.get('rules', [])
+        }
+    return packs
+
+
+def _resolve_rules(packs, language, seen=()):
+    """Collect a pack's rules together with the rules of the packs it extends"""
+    if language in seen:
+        raise ValueError(f"Rule pack '{language}' extends itself")
+    specs = []
+    for parent in packs[language]['extends']:
+        specs += _resolve_rules(packs, parent, seen + (language,))
+    return specs + packs[language]['rules']
+
+
+def _literal_trie_branches(literals, words=()):
+    """Build regex alternatives for literals with shared prefixes factored out.
+
+    sre tries alternatives one by one at every candidate position, so
+    ``if|import|in`` costs three attempts where ``i(?:f|mport|n)`` costs one.
+    Every returned branch starts with a literal character, which keeps the
+    combined pattern eligible for sre's first-character fast scan. Entries in
+    `words` only match as whole words; their boundary checks sit after the
+    first character so they do not break that fast scan either.
+    """
+    def insert(trie, text):
+        node = trie
+        for char in text:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node, whole_word):
+        branches = [
+            re.escape(char) + build(child, whole_word)
+            for char, child in sorted(node.items()) if char
+        ]
+        if '' in node and whole_word:
+            branches.append(r'(?!\w)')
+        elif '' in node:
+            # Longer literals still win over their own prefixes
+            return '(?:' + '|'.join(branches) + ')?' if branches else ''
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+
+    plain_tries = {}
+    word_tries = {}
+    for text in literals:
+        insert(plain_tries.setdefault(text[0], {}), text[1:])
+    for text in words:
+        insert(word_tries.setdefault(text[0], {}), text[1:])
+
+    branches = []
+    for char in sorted(set(plain_tries) | set(word_tries)):
+        parts = []
+        if char in word_tries:
+            parts.append(r'(?<!\w.)' + build(word_tries[char], True))
+        if char in plain_tries:
+            parts.append(build(plain_tries[char], False))
+        body = parts[0] if len(parts) == 1 else '(?:' + '|'.join(parts) + ')'
+        branches.append(re.escape(char) + body)
+    return branches
+
+
+def _occurs_in_code(text, code, start, end, in_code):
+    """True if text occurs in code[start:end] outside strings and comments (anywhere without in_code)"""
+    pos = code.find(text, start, end)
+    if in_code is None:
+        return pos != -1
+    while pos != -1:
+        if in_code(pos):
+            return True
+        pos = code.find(text, pos + 1, end)
+    return False
+
+
+class Rule:
+    """A single declarative analysis rule"""
+
+    def __init__(self, spec):
+        self.id = spec['id']
+        self.category = spec['category']
+        self.scope = spec.get('scope', 'line')
+        if self.category not in CATEGORIES:
+            raise ValueError(f"Rule '{self.id}' has unknown category '{self.category}'")
+        if 'substring' not in spec and 'regex' not in spec:
+            raise ValueError(f"Rule '{self.id}' needs a 'substring' or 'regex' trigger")
+        self.finding = spec['finding']
+        self.requires = spec.get('requires', [])
+        self.excludes = spec.get('excludes', [])
+        self.next_line_requires = spec.get('next_line_requires', [])
+        self.unless = spec.get('unless', [])
+        self.absent = spec.get('absent', False)
+        followed_by = spec.get('followed_by')
+        self.followed_by = re.compile(followed_by) if followed_by else None
+
+        if 'substring' in spec:
+            kind = 'word' if spec.get('word') else 'substring'
+            self.triggers = [(kind, spec['substring'])]
+        else:
+            patterns = spec['regex']
+            if isinstance(patterns, str):
+                patterns = [patterns]
+            self.triggers = [('regex', pattern) for pattern in patterns]
+
+        # Document rules only need to know whether their trigger occurs, so
+        # they use an early-exit search instead of riding along the walk
+        self.search = None
+        if self.scope == 'document':
+            alternatives = []
+            for kind, pattern in self.triggers:
+                if kind == 'regex':
+                    alternatives.append(pattern)
+                elif kind == 'word':
+                    alternatives.append(rf'\b{re.escape(pattern)}\b')
+                else:
+                    alternatives.append(re.escape(pattern))
+            self.search = re.compile('(?:' + '|'.join(alternatives) + ')' + (followed_by or ''))
+
+
+class _Token:
+    """One alternative of the combined matcher and everything keyed off it"""
+
+    def __init__(self, kind, pattern):
+        self.kind = kind
+        self.pattern = pattern
+        self.regex = re.compile(pattern) if kind == 'regex' else None
+        self.rules = []
+        self.metric = None
+
+
+class ScanResult:
+    """Findings and raw counters produced by one pass over the code"""
+
+    def __init__(self):
+        self.findings = {category: [] for category in CATEGORIES}
+        self.line_count = 0
+        self.non_empty_lines = 0
+        self.non_empty_chars = 0
+        self.comment_lines = 0
+        self.complexity_count = 0
+        self.function_count = 0
+        # Only known when the code was parsed (see python_analyzer)
+        self.cyclomatic_complexity = None
+        self.functions = []
+
+
+class RuleSet:
+    """All rules for one language compiled into a single alternation regex"""
+
+    def __init__(self, specs):
+        self.rules = [Rule(spec) for spec in specs]
+        self._tokens = {}
+        self._document_rules = []
+
+        for keyword in COMPLEXITY_KEYWORDS:
+            self._token('word', keyword).metric = KEYWORD
+        for marker in COMMENT_MARKERS:
+            self._token('substring', marker).metric = COMMENT
+        for marker in FUNCTION_MARKERS:
+            self._token('substring', marker).metric = FUNCTION
+        self._token('regex', BLANK_LINE_PATTERN).metric = BLANK
+
+        for rule in self.rules:
+            if rule.scope == 'document':
+                self._document_rules.append(rule)
+                continue
+            for trigger in rule.triggers:
+                self._token(*trigger).rules.append(rule)
+
+        # Literals go first (longest match wins) so a literal always takes its
+        # position and a matched text can be dispatched with one dict lookup
+        self._literals = {}
+        for token in self._tokens.values():
+            if token.kind == 'regex':
+                continue
+            if token.pattern in self._literals:
+                raise ValueError(f"'{token.pattern}' is used both as a word and as a substring trigger")
+            self._literals[token.pattern] = token
+        self._regex_tokens = [t for t in self._tokens.values() if t.kind == 'regex']
+        # Regexes are appended unwrapped: a group in front of a branch would
+        # disable the fast scan, so they should start with a literal too
+        alternatives = _literal_trie_branches(
+            [t.pattern for t in self._literals.values() if t.kind == 'substring'],
+            [t.pattern for t in self._literals.values() if t.kind == 'word'],
+        )
+        alternatives += [t.pattern for t in self._regex_tokens]
+        self._matcher = re.compile('|'.join(alternatives))
+
+    def _token(self, kind, pattern):
+        key = (kind, pattern)
+        if key not in self._tokens:
+            self._tokens[key] = _Token(kind, pattern)
+        return self._tokens[key]
+
+    def scan(self, code, lexed=None):
+        """Walk the code once and collect every finding and metric counter.
+
+        With `lexed` (see lexer.Lexer.lex), keywords and rule triggers inside
+        strings and comments are skipped and comment lines come from the lexer.
+        """
+        in_code = lexed.in_code if lexed is not None else None
+        result = ScanResult()
+        findings = result.findings
+        literals_get = self._literals.get
+        fired = set()
+        keyword_lines = set()
+        comment_lines = set()
+        complexity_count = 0
+        function_count = 0
+        blank_lines = 0
+        blank_chars = 0
+
+        line = 1
+        last_pos = 0
+
+        for match in self._matcher.finditer(code):
+            pos, end = match.span()
+            token = literals_get(match.group())
+            if token is None:
+                token = self._match_regex_token(code, pos)
+
+            line += code.count('\n', last_pos, pos)
+            last_pos = pos
+
+            metric = token.metric
+            if metric is BLANK:
+                blank_lines += 1
+                blank_chars += end - pos - 1
+                continue
+            # Both ends in code: a match may span a whole literal ('"crypto/md5"'),
+            # but not reach into one ('String s = "==";')
+            if in_code is not None and not (in_code(pos) and in_code(end - 1)):
+                continue
+
+            if metric is KEYWORD:
+                key = (line, token.pattern)
+                if key not in keyword_lines:
+                    keyword_lines.add(key)
+                    complexity_count += 1
+            elif metric is COMMENT:
+                if line not in comment_lines:
+                    if not code[code.rfind('\n', 0, pos) + 1:pos].strip():
+                        comment_lines.add(line)
+            elif metric is FUNCTION:
+                function_count += 1
+
+            for rule in token.rules:
+                if rule.followed_by is not None and not rule.followed_by.match(code, end):
+                    continue
+                if (rule.id, line) in fired:
+                    continue
+                if not self._line_conditions_hold(rule, code, pos, in_code):
+                    continue
+                fired.add((rule.id, line))
+                finding = dict(rule.finding)
+                finding['line'] = str(line)
+                findings[rule.category].append(finding)
+
+        for rule in self._document_rules:
+            hit = self._search_code(rule.search, code, in_code)
+            if hit == rule.absent:
+                continue
+            if any(_occurs_in_code(text, code, 0, len(code), in_code) for text in rule.unless):
+                continue
+            findings[rule.category].append(dict(rule.finding))
+
+        # The blank-line pattern needs a newline on both sides, so the first
+        # and last lines are checked separately
+        length = len(code)
+        first_end = code.find('\n')
+        if first_end == -1:
+            first_end = length
+        if not code[:first_end].strip():
+            blank_lines += 1
+            blank_chars += first_end
+        last_start = code.rfind('\n') + 1
+        if last_start and not code[last_start:].strip():
+            blank_lines += 1
+            blank_chars += length - last_start
+
+        result.line_count = code.count('\n') + 1
+        result.non_empty_lines = result.line_count - blank_lines
+        result.non_empty_chars = length - (result.line_count - 1) - blank_chars
+        result.comment_lines = lexed.comment_lines if lexed is not None else len(comment_lines)
+        result.complexity_count = complexity_count
+        result.function_count = function_count
+        return result
+
+    @staticmethod
+    def _search_code(regex, code, in_code):
+        # Stops at the first match that starts and ends outside strings and comments
+        if in_code is None:
+            return regex.search(code) is not None
+        return any(in_code(match.start()) and in_code(max(match.start(), match.end() - 1))
+                   for match in regex.finditer(code))
+
+    def _match_regex_token(self, code, pos):
+        # No literal matched here, so the first regex that does is the one
+        # the combined matcher picked
+        for token in self._regex_tokens:
+            if token.regex.match(code, pos):
+                return token
+
+    @staticmethod
+    def _line_conditions_hold(rule, code, pos, in_code=None):
+        # Required and excluded text only counts outside strings and comments
+        if not (rule.requires or rule.excludes or rule.next_line_requires):
+            return True
+
+        line_start = code.rfind('\n', 0, pos) + 1
+        line_end = code.find('\n', pos)
+        if line_end == -1:
+            line_end = len(code)
+
+        for required in rule.requires:
+            if not _occurs_in_code(required, code, line_start, line_end, in_code):
+                return False
+        for excluded in rule.excludes:
+            if _occurs_in_code(excluded, code, line_start, line_end, in_code):
+                return False
+        if rule.next_line_requires:
+            # The last line has no successor, so it is checked against itself
+            if line_end < len(code):
+                line_start = line_end + 1
+                line_end = code.find('\n', line_start)
+                if line_end == -1:
+                    line_end = len(code)
+            for required in rule.next_line_requires:
+                if not _occurs_in_code(required, code, line_start, line_end, in_code):
+                    return False
+        return True
+
+
+class RuleEngine:
+    """Registry of compiled rule sets, one per language"""
+
+    def __init__(self, packs):
+        # Digest of the loaded packs - changes whenever any rule does
+        self.fingerprint = hashlib.blake2b(
+            json.dumps(packs, sort_keys=True).encode('utf-8'), digest_size=8
+        ).hexdigest()
+        common = packs.get(COMMON_PACK, {'rules': []})['rules']
+        self._default = RuleSet(common)
+        self._rule_sets = {
+            language: RuleSet(common + _resolve_rules(packs, language))
+            for language in packs if language != COMMON_PACK
+        }
+
+    @classmethod
+    def from_directory(cls, directory=RULES_DIR):
+        """Build an engine from the rule packs in a directory"""
+        return cls(load_rule_packs(directory))
+
+    @property
+    def languages(self):
+        """Languages that have a dedicated rule pack"""
+        return sorted(self._rule_sets)
+
+    def rule_set(self, language):
+        """Get the compiled rule set for a language (common rules only if unknown)"""
+        return self._rule_sets.get(language, self._default)
+
+    def scan(self, code, language):
+        """Scan code with every rule for its language in a single pass"""
+        lexer = lexer_for(language)
+        lexed = lexer.lex(code) if lexer is not None else None
+        return self.rule_set(language).scan(code, lexed)
+
+# Global engine instance - rule packs are loaded and compiled once at import
+rule_engine = RuleEngine.from_directory()
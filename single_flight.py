@@ -0,0 +1,156 @@
+"""
+Single-flight execution for identical in-flight analyses
+Concurrent callers with the same key share one computation: threads of a
+worker wait on an event, other gunicorn workers wait on a per-key lock file
+"""
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within the process only
+    fcntl = None
+
+# How often a worker re-tries a lock file held by another worker
+LOCK_POLL_INTERVAL = 0.05
+
+
+class _Call:
+    """One in-flight computation and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run a computation at most once per key across threads and workers"""
+
+    def __init__(self, lock_dir=None, timeout=120):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            'leaders': 0,
+            'followers': 0,
+            'shared_across_workers': 0,
+            'timeouts': 0
+        }
+
+    def run(self, key, compute, lookup=None):
+        """
+        Return (value, shared) for a key, calling compute() only if no other
+        caller is already computing it. `lookup` re-checks a shared store once
+        the lock is held, so a result stored by another worker is reused.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats['leaders'] += 1
+            else:
+                self._stats['followers'] += 1
+
+        if not leader:
+            if call.done.wait(self.timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.value, True
+            # The leader is stuck; do the work rather than fail the request
+            self._count('timeouts')
+            return compute(), False
+
+        shared = False
+        try:
+            with self._worker_lock(key):
+                value = lookup() if lookup is not None else None
+                if value is not None:
+                    shared = True
+                    self._count('shared_across_workers')
+                else:
+                    value = compute()
+            call.value = value
+            return value, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        """Counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _worker_lock(self, key):
+        if not self.lock_dir:
+            return _NoLock()
+        return _FileLock(os.path.join(self.lock_dir, f'{key}.lock'), self.timeout)
+
+
+class _NoLock:
+    """Stand-in when cross-worker locking is unavailable"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _FileLock:
+    """Exclusive flock on a per-key file, removed again by its holder"""
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self.fd = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                if time.monotonic() >= deadline:
+                    # Give up waiting and compute without the lock
+                    return self
+                time.sleep(LOCK_POLL_INTERVAL)
+                continue
+            # The previous holder may have unlinked the file after we opened
+            # it; only a lock on the file currently at the path counts
+            try:
+                current = os.stat(self.path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and current.st_ino == os.fstat(fd).st_ino:
+                self.fd = fd
+                return self
+            os.close(fd)
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+        return False
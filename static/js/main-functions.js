@@ -62,7 +62,7 @@ async function analyzeCode() {
 
     try {
         const language = languageSelect.value;
-        const response = await fetch('/api/analyze', {
+        const response = await fetch('/api/analyze/stream', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ code, language })
@@ -70,9 +70,31 @@ async function analyzeCode() {
 
         if (!response.ok) throw new Error("Analysis failed");
 
-        const data = await response.json();
-
-        displayResults(data);
+        // Results arrive stage by stage: the ML column renders as soon as it
+        // is ready while Gemini is still working
+        const data = {
+            language,
+            ml_analysis: {},
+            ai_analysis: { summary: '⏳ Waiting for Gemini AI analysis...' }
+        };
+        await readEventStream(response, (event, payload) => {
+            if (event === 'language') {
+                data.language = payload.language;
+            } else if (event === 'ml') {
+                data.ml_analysis = payload.ml_analysis;
+                displayResults(data);
+                loadingOverlay.classList.add('hidden');
+                loadingOverlay.style.display = 'none';
+            } else if (event === 'ai') {
+                data.ai_analysis = payload.ai_analysis;
+                data.ai_fallback = payload.ai_fallback;
+                displayResults(data);
+            } else if (event === 'done') {
+                Object.assign(data, payload);
+            } else if (event === 'error') {
+                throw new Error(payload.message || 'Analysis failed');
+            }
+        });
 
         // Store data for PDF generation
         if (window.pdfGenerator) {
@@ -96,6 +118,90 @@ async function analyzeCode() {
     }
 }
 
+// Read Server-Sent Events from a fetch() response and pass each one to onEvent
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            const dataLines = [];
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+            });
+            // Lines starting with ':' are keep-alive comments and carry no data
+            if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
+}
+
+// Follow a background job until it finishes; resolves with its result.
+// Progress arrives on the job's event stream, which the server closes every
+// few seconds and which is reopened until the job finishes. Without the
+// stream (sync gunicorn workers do not offer one), the result URL is polled
+// at a growing interval
+async function waitForJob(job, onProgress, interval = 1000, maxInterval = 10000) {
+    let eventsUrl = job.events_url;
+    while (true) {
+        const streamed = eventsUrl && await followJobEvents(eventsUrl, onProgress);
+        if (!streamed) eventsUrl = null;
+
+        const response = await fetch(job.result_url);
+        const data = await response.json();
+
+        if (response.status === 202) {
+            onProgress(data.progress || {});
+            if (!streamed) {
+                await new Promise(resolve => setTimeout(resolve, interval));
+                interval = Math.min(interval * 1.5, maxInterval);
+            }
+            continue;
+        }
+        if (!response.ok) {
+            throw new Error(data.message || data.error || 'Analysis failed');
+        }
+        return data;
+    }
+}
+
+// Read a job's event stream until the server closes it; false if it could not be opened
+async function followJobEvents(url, onProgress) {
+    try {
+        const response = await fetch(url);
+        if (!response.ok) return false;
+        await readEventStream(response, (event, payload) => {
+            if (event === 'progress') onProgress(payload.progress || {});
+        });
+        return true;
+    } catch (error) {
+        console.warn('Job event stream failed, polling instead:', error);
+        return false;
+    }
+}
+
+function describeJobProgress(progress) {
+    if (progress.stage === 'analyzing') {
+        const done = (progress.fetched || 0) + (progress.fetch_failed || 0);
+        const reused = progress.files_reused ? ` (${progress.files_reused} unchanged files reused)` : '';
+        return `Analyzed ${done} of ${progress.files_to_analyze} changed files${reused}...`;
+    }
+    if (progress.stage === 'listing') {
+        return `Found ${progress.total_files} code files. Preparing analysis...`;
+    }
+    return 'Waiting for a worker...';
+}
+
 function clearCode() {
     document.getElementById('codeInput').value = '';
     document.getElementById('resultsContainer').innerHTML = `
@@ -709,8 +815,8 @@ async function analyzeGithubRepo() {
     try {
         window.toast.info('Starting repository analysis...', 'GitHub Analyzer');
 
-        // Call our backend endpoint
-        const response = await fetch('/api/analyze-github', {
+        // Queue a background job so large repositories are not cut off by request timeouts
+        const response = await fetch('/api/jobs/analyze-github', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
@@ -721,12 +827,17 @@ async function analyzeGithubRepo() {
             })
         });
 
-        const data = await response.json();
+        const job = await response.json();
 
         if (!response.ok) {
-            throw new Error(data.message || data.error || 'Analysis failed');
+            throw new Error(job.message || job.error || 'Analysis failed');
         }
 
+        const data = await waitForJob(job, (progress) => {
+            const status = resultsDiv.querySelector('.text-muted');
+            if (status) status.textContent = describeJobProgress(progress);
+        });
+
         window.toast.success(`Analyzed ${data.analyzed_files} files!`, 'Analysis Complete');
 
         // Save to Firestore